@@ -14,6 +14,18 @@ São amigos de pelo menos 2 dos seus amigos
 
 Retorne os recomendados ordenados alfabeticamente"""
 
+import os
+from itertools import islice
+
+from analise import exibir_estatisticas
+from armazenamento import ArmazenamentoRede
+from cache_recomendacao import CacheRecomendacao
+from grafo import ErroGrafo
+from grafo_compacto import GrafoCompacto
+from indice_amigos import IndiceAmigosEmComum
+
+DIRETORIO_DADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados")
+
 
 def perfil():
     print("""
@@ -23,6 +35,7 @@ def perfil():
     [2] SELECIONAR USUARIO
     [3] EXCLUIR USUARIO
     [4] LISTAR REDE
+    [9] ESTATISTICAS DA REDE
               """)
     return input("Digite a acao que deseja fazer: ").strip()
 
@@ -41,7 +54,7 @@ def adiciona_usuario(rede):
     if nome in rede:
         print(f"Usuario {nome} ja existe!!!")
     else:
-        rede[nome] = set()
+        rede.adicionar_usuario(nome)
         print("Usuario criado com sucesso!!!")
 
 def remove_usuario(rede):
@@ -49,7 +62,7 @@ def remove_usuario(rede):
     if nome not in rede:
         print(f"Usuario {nome} nao existe!!!")
     else:
-        del rede[nome]
+        rede.remover_usuario(nome)
         print("Usuario removido com sucesso!!!")
     return rede
 
@@ -63,33 +76,47 @@ def selecionar_usuario(rede):
         print("Usuario não existe!!!")
         return None
 
-def listar_usuario(rede):
-    usuarios = sorted(rede.items())
+def escrever_amigos(amigos, tamanho_bloco=1000):
+    amigos = iter(amigos)
+    bloco = list(islice(amigos, tamanho_bloco))
+    print(", ".join(bloco), end="")
+    while bloco := list(islice(amigos, tamanho_bloco)):
+        print(", " + ", ".join(bloco), end="")
+    print()
+
+def listar_usuario(rede, prefixo=""):
     print("Lista de usuarios e amigos\n")
-    for chave, valor in usuarios:
-        print(f"{chave}: {', '.join(valor)}")
+    for chave in rede.usuarios_ordenados(prefixo):
+        print(f"{chave}: ", end="")
+        escrever_amigos(rede[chave])
 
 def adiciona_amigo(rede, usuario):
     nome = input("Digite o nome do amigo que deseja adicionar: ").strip()
     if nome in rede[usuario]:
         print(f"Esse amigo {nome} ja esta adicionado")
     else:
-        rede[usuario].add(nome)
-        print(f"Amigo {nome} adicionado com sucesso!!!")
+        try:
+            rede.adicionar_amizade(usuario, nome)
+        except ErroGrafo as erro:
+            print(f"{erro}!!!")
+        else:
+            print(f"Amigo {nome} adicionado com sucesso!!!")
 
 def remove_amigo(rede, usuario):
     nome = input("Digite o nome do amigo que deseja adicionar: ").strip()
     if nome not in rede[usuario]:
         print(f"Eles nao sao amigos!!!")
     else:
-        rede[usuario].remove(nome)
+        rede.remover_amizade(usuario, nome)
         print(f"Amigo adicionado com sucesso - {nome}!")
 
 def lista_amigo(rede, usuario):
     print(f"Lista de amigos de {usuario}")
     print(f"\n".join(rede[usuario]))
 
-def recomendacao(rede,usuario):
+def recomendar(rede, usuario, fonte=None):
+    if fonte is not None:
+        return fonte.recomendar(usuario)
     seus_amigos = rede[usuario]
     contador = {}
     for amigo in seus_amigos:
@@ -97,7 +124,10 @@ def recomendacao(rede,usuario):
             if amigo_de_amigo != usuario and amigo_de_amigo not in seus_amigos:
                 contador[amigo_de_amigo] = contador.get(amigo_de_amigo, 0)+1
 
-    recomendado = sorted([pessoa for pessoa,qtd in contador.items() if qtd >= 2])
+    return sorted([pessoa for pessoa,qtd in contador.items() if qtd >= 2])
+
+def recomendacao(rede,usuario, fonte=None):
+    recomendado = recomendar(rede, usuario, fonte)
     if recomendado:
         print(f"Recomendacoes de amigos para {usuario}")
         for nome in recomendado:
@@ -108,7 +138,13 @@ def recomendacao(rede,usuario):
     
 
 def main():
-    rede = {"Afonso":{"Ana","Carol","Jose"},"Ana":{"Afonso","Jose","Ryan"}, "Carol":{"Afonso", "Ryan","Jose"}}
+    armazenamento = ArmazenamentoRede(DIRETORIO_DADOS)
+    # o GrafoCompacto usa o CSR do snapshot mapeado, sem copiar a rede
+    rede = armazenamento.carregar({"Afonso":{"Ana","Carol","Jose"},"Ana":{"Afonso","Jose","Ryan"}, "Carol":{"Afonso", "Ryan","Jose"}},
+                                  classe=GrafoCompacto)
+    indice = IndiceAmigosEmComum(rede)
+    cache = CacheRecomendacao(rede, indice.recomendar)
+    rede.observadores.extend([indice, cache, armazenamento])
     usuario =""
     
     while True:
@@ -124,7 +160,7 @@ def main():
                 if n == "5":
                     adiciona_amigo(rede,usuario)
                 elif n == "6":
-                    recomendacao(rede, usuario)
+                    recomendacao(rede, usuario, cache)
                 elif n == "7":
                     remove_amigo(rede, usuario)
                 elif n == "8":
@@ -134,8 +170,17 @@ def main():
             remove_usuario(rede)
 
         elif n == "4":
-            listar_usuario(rede)
+            prefixo = input("Filtrar por inicio do nome (Enter para todos): ").strip()
+            listar_usuario(rede, prefixo)
         
+        elif n == "9":
+            exibir_estatisticas(rede)
+
         elif n == "0":
+            armazenamento.compactar()
+            armazenamento.fechar()
             break
-main()
\ No newline at end of file
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Estatisticas da rede: distribuicao de graus, componentes conexas,
+triangulos e coeficiente de agrupamento.
+
+Os nomes viram ids e cada aresta e orientada do usuario de menor grau para
+o de maior grau (desempate pelo id). Assim cada triangulo e achado uma vez
+so, pela intersecao dos `set`s "para frente" das duas pontas de uma aresta,
+feita em C. A contagem de triangulos pode ser dividida em fatias de
+usuarios e rodar num `ProcessPoolExecutor`.
+"""
+
+import time
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+_frente = None
+
+
+def _ids(grafo):
+    nomes = list(grafo)
+    ids = {nome: i for i, nome in enumerate(nomes)}
+    vizinhos = [[ids[amigo] for amigo in grafo[nome]] for nome in nomes]
+    return nomes, vizinhos
+
+
+def histograma_graus(vizinhos):
+    return dict(sorted(Counter(len(amigos) for amigos in vizinhos).items()))
+
+
+def componentes(vizinhos):
+    """Union-find com compressao por metade e uniao por tamanho. Retorna
+    o id do representante de cada usuario."""
+    pai = array("l", range(len(vizinhos)))
+    tamanho = array("l", [1]) * len(vizinhos)
+
+    def raiz(x):
+        while pai[x] != x:
+            pai[x] = pai[pai[x]]
+            x = pai[x]
+        return x
+
+    for a, amigos in enumerate(vizinhos):
+        for b in amigos:
+            if a < b:
+                ra, rb = raiz(a), raiz(b)
+                if ra != rb:
+                    if tamanho[ra] < tamanho[rb]:
+                        ra, rb = rb, ra
+                    pai[rb] = ra
+                    tamanho[ra] += tamanho[rb]
+    return [raiz(x) for x in range(len(vizinhos))]
+
+
+def _orientar(vizinhos):
+    graus = [len(amigos) for amigos in vizinhos]
+    return [
+        {b for b in amigos if (graus[b], b) > (graus[a], a)}
+        for a, amigos in enumerate(vizinhos)
+    ]
+
+
+def _iniciar_processo(frente):
+    global _frente
+    _frente = frente
+
+
+def _triangulos_fatia(inicio, fim, frente=None):
+    """Triangulos cuja ponta de menor ordem esta em [inicio, fim), somados
+    por usuario como `{id: qtd}`."""
+    frente = frente if frente is not None else _frente
+    por_usuario = Counter()
+    for a in range(inicio, fim):
+        frente_a = frente[a]
+        for b in frente_a:
+            comuns = frente_a & frente[b]
+            if comuns:
+                por_usuario[a] += len(comuns)
+                por_usuario[b] += len(comuns)
+                por_usuario.update(comuns)
+    return por_usuario
+
+
+def triangulos(vizinhos, processos=1, tamanho_fatia=20_000):
+    """Retorna `(total, triangulos_por_usuario)`."""
+    frente = _orientar(vizinhos)
+    n = len(vizinhos)
+    if processos <= 1 or n <= tamanho_fatia:
+        por_usuario = _triangulos_fatia(0, n, frente)
+    else:
+        por_usuario = Counter()
+        with ProcessPoolExecutor(processos, initializer=_iniciar_processo,
+                                 initargs=(frente,)) as pool:
+            fatias = [
+                pool.submit(_triangulos_fatia, inicio, min(inicio + tamanho_fatia, n))
+                for inicio in range(0, n, tamanho_fatia)
+            ]
+            for fatia in fatias:
+                por_usuario.update(fatia.result())
+    return sum(por_usuario.values()) // 3, por_usuario
+
+
+def agrupamento(vizinhos, por_usuario):
+    """Coeficiente de agrupamento medio (local) e transitividade (global)."""
+    soma_local = 0.0
+    trios = 0
+    for uid, amigos in enumerate(vizinhos):
+        grau = len(amigos)
+        pares = grau * (grau - 1) // 2
+        trios += pares
+        if pares:
+            soma_local += por_usuario.get(uid, 0) / pares
+    media = soma_local / len(vizinhos) if vizinhos else 0.0
+    total = sum(por_usuario.values()) // 3
+    transitividade = 3 * total / trios if trios else 0.0
+    return media, transitividade
+
+
+def analisar(grafo, processos=1):
+    """Calcula todas as estatisticas e o tempo de cada etapa, em segundos."""
+    tempos = {}
+    inicio = time.perf_counter()
+    nomes, vizinhos = _ids(grafo)
+    tempos["preparo"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    graus = histograma_graus(vizinhos)
+    tempos["graus"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    raizes = componentes(vizinhos)
+    tamanhos = sorted(Counter(raizes).values(), reverse=True)
+    tempos["componentes"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    total, por_usuario = triangulos(vizinhos, processos)
+    tempos["triangulos"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    media, transitividade = agrupamento(vizinhos, por_usuario)
+    tempos["agrupamento"] = time.perf_counter() - inicio
+
+    return {
+        "usuarios": len(nomes),
+        "amizades": sum(len(amigos) for amigos in vizinhos) // 2,
+        "histograma_graus": graus,
+        "componentes": len(tamanhos),
+        "maior_componente": tamanhos[0] if tamanhos else 0,
+        "triangulos": total,
+        "agrupamento_medio": media,
+        "transitividade": transitividade,
+        "tempos": tempos,
+    }
+
+
+def exibir_estatisticas(grafo, processos=1):
+    resultado = analisar(grafo, processos)
+    print("Estatisticas da rede\n")
+    print(f"Usuarios: {resultado['usuarios']}")
+    print(f"Amizades: {resultado['amizades']}")
+    print("Graus (grau: usuarios):")
+    for grau, quantidade in resultado["histograma_graus"].items():
+        print(f"  {grau}: {quantidade}")
+    print(f"Componentes conexas: {resultado['componentes']} "
+          f"(maior com {resultado['maior_componente']} usuarios)")
+    print(f"Triangulos: {resultado['triangulos']}")
+    print(f"Agrupamento medio: {resultado['agrupamento_medio']:.4f}")
+    print(f"Transitividade: {resultado['transitividade']:.4f}")
+    print("Tempos: " + ", ".join(
+        f"{etapa} {segundos * 1000:.1f} ms" for etapa, segundos in resultado["tempos"].items()
+    ))
+    return resultado
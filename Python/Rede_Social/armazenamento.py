@@ -0,0 +1,217 @@
+"""Persistencia da rede em disco: log de eventos + snapshot binario.
+
+Cada mudanca vira uma linha JSON no log da geracao atual
+(`rede.<geracao>.log`). De tempos em tempos o estado inteiro e compactado
+num snapshot binario (`rede.snap`) e um log novo, vazio, e aberto; na
+inicializacao basta abrir o snapshot com mmap e reaplicar o log da geracao
+dele.
+
+Formato do snapshot (little endian, blocos alinhados em 8 bytes):
+
+    cabecalho   MAGICO, versao, geracao, n_nomes, n_arestas, bytes_nomes
+    nomes       utf-8 separados por "\\n", em ordem alfabetica
+    usuarios    1 byte por nome: 1 se e chave da rede, 0 se so aparece
+                como amigo de alguem
+    indptr      int64[n_nomes + 1]
+    indices     uint32[n_arestas]
+
+`indptr`/`indices` sao o mesmo CSR de `motor_recomendacao`, entao o motor
+pode rodar direto sobre o arquivo mapeado.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from grafo import Grafo
+from motor_recomendacao import MotorRecomendacao
+
+MAGICO = b"REDE"
+VERSAO = 1
+CABECALHO = struct.Struct("<4sIQQQQ")
+COMPACTAR_A_CADA = 100_000
+
+
+def _alinhar(posicao):
+    return (posicao + 7) & ~7
+
+
+class ArmazenamentoRede:
+    def __init__(self, diretorio, compactar_a_cada=COMPACTAR_A_CADA):
+        self.diretorio = diretorio
+        self.compactar_a_cada = compactar_a_cada
+        self.rede = None
+        self.geracao = 0
+        self.eventos_no_log = 0
+        self._log = None
+        os.makedirs(diretorio, exist_ok=True)
+
+    @property
+    def caminho_snapshot(self):
+        return os.path.join(self.diretorio, "rede.snap")
+
+    def caminho_log(self, geracao):
+        return os.path.join(self.diretorio, f"rede.{geracao}.log")
+
+    # ------------------------------------------------------------ leitura
+
+    def abrir_snapshot(self):
+        """Mapeia o snapshot e retorna (geracao, nomes, usuarios, indptr,
+        indices); os tres ultimos sao memoryviews sobre o arquivo, que e
+        desmapeado quando elas forem coletadas."""
+        if not os.path.exists(self.caminho_snapshot):
+            return None
+
+        with open(self.caminho_snapshot, "rb") as arquivo:
+            mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        magico, versao, geracao, n_nomes, n_arestas, bytes_nomes = \
+            CABECALHO.unpack_from(mapa)
+        if magico != MAGICO or versao != VERSAO:
+            mapa.close()
+            raise ValueError(f"Snapshot invalido: {self.caminho_snapshot}")
+
+        visao = memoryview(mapa)
+        posicao = CABECALHO.size
+        texto = bytes(visao[posicao:posicao + bytes_nomes]).decode("utf-8")
+        nomes = texto.split("\n") if n_nomes else []
+        posicao = _alinhar(posicao + bytes_nomes)
+        usuarios = visao[posicao:posicao + n_nomes]
+        posicao = _alinhar(posicao + n_nomes)
+        indptr = visao[posicao:posicao + (n_nomes + 1) * 8].cast("q")
+        posicao += (n_nomes + 1) * 8
+        indices = visao[posicao:posicao + n_arestas * 4].cast("I")
+        # o mapa fica vivo enquanto houver views sobre ele
+        return geracao, nomes, usuarios, indptr, indices
+
+    def abrir_motor(self):
+        """Motor de recomendacao sobre o snapshot mapeado, sem copiar a
+        adjacencia (nao inclui o que ainda esta so no log)."""
+        aberto = self.abrir_snapshot()
+        if aberto is None:
+            return None
+        _, nomes, _, indptr, indices = aberto
+        return MotorRecomendacao.de_csr(nomes, indptr, indices)
+
+    def carregar(self, padrao=None, classe=Grafo):
+        """Reconstroi a rede a partir do snapshot mais o log da geracao dele.
+        Sem nada em disco, usa `padrao` e ja grava o primeiro snapshot.
+        `classe` escolhe a implementacao (`Grafo` ou `GrafoCompacto`)."""
+        aberto = self.abrir_snapshot()
+        if aberto is None and not os.path.exists(self.caminho_log(0)):
+            self.rede = classe(padrao)
+            self.compactar()
+            return self.rede
+
+        if aberto is not None:
+            self.geracao, nomes, usuarios, indptr, indices = aberto
+            rede = classe.de_csr(nomes, usuarios, indptr, indices)
+        else:
+            rede = classe()
+        self.rede = rede
+        self.eventos_no_log = self._reaplicar(self.caminho_log(self.geracao))
+        self._abrir_log()
+        return rede
+
+    def _reaplicar(self, caminho):
+        if not os.path.exists(caminho):
+            return 0
+        total = 0
+        valido = 0
+        with open(caminho, "r+b") as arquivo:
+            for linha in arquivo:
+                try:
+                    if not linha.endswith(b"\n"):
+                        raise ValueError
+                    evento, *argumentos = json.loads(linha)
+                except ValueError:
+                    # ultima linha cortada por uma queda no meio da escrita:
+                    # corta o arquivo para o proximo evento nao colar nela
+                    arquivo.truncate(valido)
+                    break
+                self._aplicar(evento, argumentos)
+                valido += len(linha)
+                total += 1
+        return total
+
+    def _aplicar(self, evento, argumentos):
+        rede = self.rede
+        if evento == "usuario+":
+            rede.adicionar_usuario(argumentos[0])
+        elif evento == "usuario-":
+            rede.remover_usuario(argumentos[0])
+        elif evento == "aresta+":
+            rede.adicionar_amizade(*argumentos)
+        elif evento == "aresta-":
+            rede.remover_amizade(*argumentos)
+
+    # ------------------------------------------------------------ escrita
+
+    def _abrir_log(self):
+        if self._log is not None:
+            self._log.close()
+        self._log = open(self.caminho_log(self.geracao), "a", encoding="utf-8")
+
+    def _registrar(self, *evento):
+        self._log.write(json.dumps(evento, ensure_ascii=False))
+        self._log.write("\n")
+        self._log.flush()
+        self.eventos_no_log += 1
+
+    def compactar(self):
+        """Grava o estado atual como snapshot da proxima geracao, troca para
+        um log vazio e apaga o log antigo."""
+        nomes, usuarios, indptr, indices = self.rede.para_csr()
+        if sys.byteorder != "little":
+            indptr, indices = array("q", indptr), array("I", indices)
+            indptr.byteswap()
+            indices.byteswap()
+        texto = "\n".join(nomes).encode("utf-8")
+
+        geracao_antiga = self.geracao
+        nova_geracao = geracao_antiga + 1
+        temporario = self.caminho_snapshot + ".tmp"
+        with open(temporario, "wb") as arquivo:
+            arquivo.write(CABECALHO.pack(MAGICO, VERSAO, nova_geracao,
+                                         len(nomes), len(indices), len(texto)))
+            for bloco in (texto, usuarios):
+                arquivo.write(bloco)
+                arquivo.write(b"\0" * (_alinhar(arquivo.tell()) - arquivo.tell()))
+            arquivo.write(indptr)
+            arquivo.write(indices)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+
+        os.replace(temporario, self.caminho_snapshot)
+        self.geracao = nova_geracao
+        self.eventos_no_log = 0
+        self._abrir_log()
+        if os.path.exists(self.caminho_log(geracao_antiga)):
+            os.remove(self.caminho_log(geracao_antiga))
+
+    def fechar(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    # ------------------------------------------------------- observador
+
+    def usuario_adicionado(self, nome):
+        self._registrar("usuario+", nome)
+
+    def usuario_removido(self, nome, amigos):
+        self._registrar("usuario-", nome)
+
+    def aresta_adicionada(self, origem, destino):
+        self._registrar("aresta+", origem, destino)
+
+    def aresta_removida(self, origem, destino):
+        self._registrar("aresta-", origem, destino)
+
+    def mudanca_concluida(self):
+        # so entre mudancas inteiras: no meio de uma amizade o snapshot
+        # teria so um dos sentidos dela
+        if self.eventos_no_log >= self.compactar_a_cada:
+            self.compactar()
@@ -0,0 +1,140 @@
+"""Benchmark da rede social sobre redes sinteticas.
+
+Mede, para cada modelo de rede e tamanho:
+
+    recomendacao   latencia de `recomendar` para um usuario (p50/p90/p99)
+    lote           usuarios/s do `MotorRecomendacao.recomendar_lote`
+    mutacao        amizades adicionadas + removidas por segundo no `Grafo`
+    listagem       tempo de `listar_usuario` (saida descartada)
+    memoria        pico do tracemalloc ao montar o `Grafo`
+
+e grava tudo em JSON, para comparar execucoes de commits diferentes:
+
+    python benchmark.py --usuarios 1000 10000 --saida resultado.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from RedeSocial import listar_usuario, recomendar
+from gerador_grafos import GERADORES
+from grafo import Grafo
+from motor_recomendacao import MotorRecomendacao
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+def medir_memoria(rede):
+    tracemalloc.start()
+    grafo = Grafo(rede)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return grafo, pico
+
+
+def medir_recomendacao(grafo, amostra):
+    tempos = []
+    for usuario in amostra:
+        inicio = time.perf_counter()
+        recomendar(grafo, usuario)
+        tempos.append(time.perf_counter() - inicio)
+    return {
+        "p50_ms": _percentil(tempos, 50) * 1000,
+        "p90_ms": _percentil(tempos, 90) * 1000,
+        "p99_ms": _percentil(tempos, 99) * 1000,
+        "media_ms": statistics.fmean(tempos) * 1000,
+    }
+
+
+def medir_lote(grafo, amostra):
+    inicio = time.perf_counter()
+    motor = MotorRecomendacao(grafo)
+    montagem = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    motor.recomendar_lote(amostra)
+    return {"montagem_s": montagem, "usuarios_por_s": len(amostra) / (time.perf_counter() - inicio)}
+
+
+def medir_mutacao(grafo, operacoes, aleatorio):
+    usuarios = list(grafo)
+    pares = [tuple(aleatorio.sample(usuarios, 2)) for _ in range(operacoes)]
+    feitas = 0
+    inicio = time.perf_counter()
+    for a, b in pares:
+        if grafo.adicionar_amizade(a, b):
+            grafo.remover_amizade(a, b)
+            feitas += 2
+    return {"operacoes_por_s": feitas / (time.perf_counter() - inicio)}
+
+
+def medir_listagem(grafo):
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        listar_usuario(grafo)
+    return {"segundos": time.perf_counter() - inicio}
+
+
+def executar(modelo, n, args):
+    aleatorio = random.Random(args.semente)
+    rede = GERADORES[modelo](n, semente=args.semente)
+    grafo, pico = medir_memoria(rede)
+    del rede
+    amostra = aleatorio.sample(sorted(grafo), min(args.amostra, len(grafo)))
+    return {
+        "modelo": modelo,
+        "usuarios": len(grafo),
+        "amizades": grafo.total_amizades(),
+        "memoria_pico_bytes": pico,
+        "recomendacao": medir_recomendacao(grafo, amostra),
+        "lote": medir_lote(grafo, amostra),
+        "mutacao": medir_mutacao(grafo, args.mutacoes, aleatorio),
+        "listagem": medir_listagem(grafo),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da rede social")
+    parser.add_argument("--modelos", nargs="+", choices=sorted(GERADORES), default=sorted(GERADORES))
+    parser.add_argument("--usuarios", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--amostra", type=int, default=500)
+    parser.add_argument("--mutacoes", type=int, default=10_000)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--saida", help="arquivo JSON (padrao: stdout)")
+    args = parser.parse_args()
+
+    resultado = {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "semente": args.semente,
+        "execucoes": [executar(modelo, n, args) for modelo in args.modelos for n in args.usuarios],
+    }
+    texto = json.dumps(resultado, indent=2)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto + "\n")
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
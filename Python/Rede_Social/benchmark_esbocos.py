@@ -0,0 +1,144 @@
+"""Precisao x velocidade da recomendacao aproximada (`esbocos`) contra a
+exata, nos usuarios de maior grau de uma rede Barabasi-Albert.
+
+Precisao e revocacao sao do conjunto com pelo menos `corte` amigos em
+comum, o de `recomendar(usuario, aproximado=True)`. As colunas de garantia conferem o que `erro` promete:
+`no erro` e a fracao dos candidatos cuja estimativa errou no maximo
+`erro * grau` (deve ficar perto de `confianca` ou acima); `rev fora` e a
+revocacao dos candidatos com `corte + erro * grau` ou mais e `fp fora` a
+fracao dos recomendados com menos de `corte - erro * grau`. Top-10 e a
+fracao dos 10 melhores exatos entre os 10 de `ranking` e `top na barra`
+a fracao dos 10 de `ranking` cuja contagem exata cabe em `estimativa +-
+margem`.
+
+Na Barabasi-Albert quase ninguem divide `erro * grau` amigos com um hub,
+entao o conjunto recomendado costuma ser vazio dos dois lados; a
+Watts-Strogatz (anel com `k = 2 * arestas-por-usuario` vizinhos) tem
+sobreposicoes grandes e exercita a precisao e a revocacao.
+
+    python benchmark_esbocos.py --usuarios 50000 --limiar 500 --erro 0.05 0.1
+    python benchmark_esbocos.py --gerador watts_strogatz --usuarios 5000 \
+        --arestas-por-usuario 400 --limiar 500
+"""
+
+import argparse
+import time
+
+from esbocos import MotorAproximado
+from gerador_grafos import barabasi_albert, watts_strogatz
+from grafo import Grafo
+
+
+def _top(contagem, k):
+    return {nome for nome, _ in sorted(contagem.items(), key=lambda item: (-item[1], item[0]))[:k]}
+
+
+def _top_aproximado(motor, usuario, k):
+    # `ranking` com a mesma semente da `contagem_aproximada` medida
+    estado = motor.aleatorio.getstate()
+    ranking = motor.ranking(usuario, k)
+    motor.aleatorio.setstate(estado)
+    return ranking
+
+
+def _fmt(valor):
+    return "-" if valor is None else f"{valor:.3f}"
+
+
+def comparar(motor, usuarios, top=10):
+    tempo_exato = tempo_aproximado = 0.0
+    verdadeiros = falsos = perdidos = 0
+    no_erro = candidatos = 0
+    fortes = fortes_achados = fracos_incluidos = 0
+    acertos_top = na_barra = 0
+    erros_alcance = []
+    for usuario in usuarios:
+        corte = motor.corte(usuario)
+        margem = motor.erro * len(motor.rede[usuario])
+
+        inicio = time.perf_counter()
+        exata = motor.contagem_exata(usuario)
+        esperado = {nome for nome, qtd in exata.items() if qtd >= corte}
+        tempo_exato += time.perf_counter() - inicio
+
+        ranking = _top_aproximado(motor, usuario, top)
+        inicio = time.perf_counter()
+        aproximada = motor.contagem_aproximada(usuario)
+        obtido = {nome for nome, qtd in aproximada.items() if qtd >= corte}
+        tempo_aproximado += time.perf_counter() - inicio
+        acertos_top += len(_top(exata, top) & {nome for nome, _, _ in ranking})
+        na_barra += sum(1 for nome, estimativa, barra in ranking
+                        if abs(exata.get(nome, 0) - estimativa) <= barra)
+
+        verdadeiros += len(obtido & esperado)
+        falsos += len(obtido - esperado)
+        perdidos += len(esperado - obtido)
+
+        for nome in exata.keys() | aproximada.keys():
+            candidatos += 1
+            no_erro += abs(aproximada.get(nome, 0) - exata.get(nome, 0)) <= margem
+        forte = {nome for nome, qtd in exata.items() if qtd >= corte + margem}
+        fortes += len(forte)
+        fortes_achados += len(forte & obtido)
+        fracos_incluidos += sum(1 for nome in obtido if exata.get(nome, 0) < corte - margem)
+
+        real = len(set().union(*(motor.rede[amigo] for amigo in motor.rede[usuario])))
+        erros_alcance.append(abs(motor.alcance(usuario) - real) / real)
+
+    return {
+        "exato_ms": tempo_exato / len(usuarios) * 1000,
+        "aproximado_ms": tempo_aproximado / len(usuarios) * 1000,
+        # None quando o conjunto e vazio (nada a medir)
+        "precisao": verdadeiros / (verdadeiros + falsos) if verdadeiros + falsos else None,
+        "revocacao": verdadeiros / (verdadeiros + perdidos) if verdadeiros + perdidos else None,
+        "no_erro": no_erro / candidatos if candidatos else None,
+        "revocacao_fora": fortes_achados / fortes if fortes else None,
+        "falsos_fora": fracos_incluidos / (verdadeiros + falsos) if verdadeiros + falsos else None,
+        "top": acertos_top / (top * len(usuarios)),
+        "top_na_barra": na_barra / (top * len(usuarios)),
+        "erro_alcance": sum(erros_alcance) / len(erros_alcance),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--gerador", choices=["barabasi_albert", "watts_strogatz"],
+                        default="barabasi_albert")
+    parser.add_argument("--usuarios", type=int, default=50_000)
+    parser.add_argument("--arestas-por-usuario", type=int, default=5)
+    parser.add_argument("--limiar", type=int, default=500)
+    parser.add_argument("--erro", type=float, nargs="+", default=[0.05, 0.1, 0.2])
+    parser.add_argument("--amostra", type=int, default=10)
+    parser.add_argument("--confianca", type=float, default=0.95)
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.gerador == "watts_strogatz":
+        rede = watts_strogatz(args.usuarios, 2 * args.arestas_por_usuario, 0.1, args.semente)
+    else:
+        rede = barabasi_albert(args.usuarios, args.arestas_por_usuario, args.semente)
+    grafo = Grafo(rede)
+    maiores = sorted(grafo, key=lambda nome: len(grafo[nome]), reverse=True)[:args.amostra]
+    print(f"{len(grafo)} usuarios, graus avaliados: "
+          f"{len(grafo[maiores[-1]])}..{len(grafo[maiores[0]])}")
+    print(f"{'erro':>6} {'amostra':>8} {'aprox':>6} {'exato ms':>9} {'aprox ms':>9} "
+          f"{'precisao':>9} {'revocacao':>10} {'no erro':>8} {'rev fora':>9} {'fp fora':>8} "
+          f"{'top-10':>7} {'top na barra':>13} {'erro alcance':>13}")
+    for erro in args.erro:
+        motor = MotorAproximado(grafo, args.limiar, erro, semente=args.semente,
+                                confianca=args.confianca)
+        # so os usuarios em que o motor de fato usa o modo aproximado
+        usuarios = [nome for nome in maiores if motor.aproximado(nome)]
+        if not usuarios:
+            print(f"{erro:>6} {motor.amostra:>8} {0:>6}  (amostra > grau / 2: tudo exato)")
+            continue
+        r = comparar(motor, usuarios)
+        print(f"{erro:>6} {motor.amostra:>8} {len(usuarios):>6} {r['exato_ms']:>9.2f} "
+              f"{r['aproximado_ms']:>9.2f} {_fmt(r['precisao']):>9} {_fmt(r['revocacao']):>10} "
+              f"{_fmt(r['no_erro']):>8} {_fmt(r['revocacao_fora']):>9} "
+              f"{_fmt(r['falsos_fora']):>8} {r['top']:>7.3f} {r['top_na_barra']:>13.3f} "
+              f"{r['erro_alcance']:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Compara a vazao de cada estrategia de `pontuacao` em redes de lei de
+potencia (Barabasi-Albert).
+
+    python benchmark_pontuacao.py --usuarios 20000 --arestas-por-usuario 5
+"""
+
+import argparse
+import random
+import time
+
+from gerador_grafos import barabasi_albert
+from motor_recomendacao import MotorRecomendacao
+from pontuacao import PONTUACOES
+
+
+def contar_em_python(rede, usuario):
+    """Contagem original de `recomendacao`, como referencia."""
+    seus_amigos = rede[usuario]
+    contador = {}
+    for amigo in seus_amigos:
+        for amigo_de_amigo in rede[amigo]:
+            if amigo_de_amigo != usuario and amigo_de_amigo not in seus_amigos:
+                contador[amigo_de_amigo] = contador.get(amigo_de_amigo, 0) + 1
+    return contador
+
+
+def medir_referencia(rede, amostra):
+    inicio = time.perf_counter()
+    for usuario in amostra:
+        contar_em_python(rede, usuario)
+    return len(amostra) / (time.perf_counter() - inicio)
+
+
+def medir(motor, pontuacao, amostra):
+    inicio = time.perf_counter()
+    for uid in amostra:
+        motor.pontuar_id(uid, pontuacao)
+    return len(amostra) / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--usuarios", type=int, nargs="+", default=[5000, 20000])
+    parser.add_argument("--arestas-por-usuario", type=int, default=5)
+    parser.add_argument("--amostra", type=int, default=500)
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'usuarios':>9} {'arestas':>9} {'pontuacao':>12} {'usuarios/s':>11}")
+    for n in args.usuarios:
+        rede = barabasi_albert(n, args.arestas_por_usuario, args.semente)
+        motor = MotorRecomendacao(rede)
+        # tabelas de grau fora da medicao, como em producao
+        motor.inverso_grau, motor.inverso_log_grau
+        amostra = random.Random(args.semente).sample(range(len(motor)), min(args.amostra, len(motor)))
+        vazao = medir_referencia(rede, [motor.nomes[uid] for uid in amostra])
+        print(f"{n:>9} {motor.total_arestas // 2:>9} {'referencia':>12} {vazao:>11.0f}")
+        for nome in PONTUACOES:
+            vazao = medir(motor, nome, amostra)
+            print(f"{n:>9} {motor.total_arestas // 2:>9} {nome:>12} {vazao:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Cache LRU (com TTL opcional) de recomendacoes.
+
+A recomendacao de um usuario so depende da lista de amigos dele e das
+listas de amigos de cada amigo. Ao guardar um resultado, o cache anota o
+usuario como dependente de cada uma dessas listas; quando o `Grafo` avisa
+que a lista de alguem mudou, so os dependentes dela sao invalidados.
+"""
+
+import time
+from collections import OrderedDict
+
+
+class CacheRecomendacao:
+    def __init__(self, rede, calcular, capacidade=10_000, ttl=None, relogio=time.monotonic):
+        self.rede = rede
+        self.calcular = calcular
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self.relogio = relogio
+        self._entradas = OrderedDict()
+        self._dependentes = {}
+        self.acertos = 0
+        self.falhas = 0
+        self.despejos = 0
+        self.invalidacoes = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def __contains__(self, usuario):
+        return usuario in self._entradas
+
+    def estatisticas(self):
+        consultas = self.acertos + self.falhas
+        return {
+            "tamanho": len(self._entradas),
+            "capacidade": self.capacidade,
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "despejos": self.despejos,
+            "invalidacoes": self.invalidacoes,
+            "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+        }
+
+    def recomendar(self, usuario):
+        entrada = self._entradas.get(usuario)
+        if entrada is not None:
+            valor, expira_em, _ = entrada
+            if expira_em is None or self.relogio() < expira_em:
+                self._entradas.move_to_end(usuario)
+                self.acertos += 1
+                return valor
+            self._descartar(usuario)
+
+        self.falhas += 1
+        valor = self.calcular(usuario)
+        dependencias = {usuario, *self.rede.get(usuario, ())}
+        expira_em = None if self.ttl is None else self.relogio() + self.ttl
+        self._entradas[usuario] = (valor, expira_em, dependencias)
+        for nome in dependencias:
+            self._dependentes.setdefault(nome, set()).add(usuario)
+
+        while len(self._entradas) > self.capacidade:
+            self._descartar(next(iter(self._entradas)))
+            self.despejos += 1
+        return valor
+
+    def _descartar(self, usuario):
+        _, _, dependencias = self._entradas.pop(usuario)
+        for nome in dependencias:
+            dependentes = self._dependentes.get(nome)
+            if dependentes is not None:
+                dependentes.discard(usuario)
+                if not dependentes:
+                    del self._dependentes[nome]
+
+    def invalidar(self, nome):
+        """Invalida quem depende da lista de amigos de `nome`."""
+        for usuario in list(self._dependentes.get(nome, ())):
+            self._descartar(usuario)
+            self.invalidacoes += 1
+
+    def limpar(self):
+        self._entradas.clear()
+        self._dependentes.clear()
+
+    # ------------------------------------------------------- observador
+
+    def usuario_adicionado(self, nome):
+        pass
+
+    def usuario_removido(self, nome, amigos):
+        self.invalidar(nome)
+        for amigo in amigos:
+            self.invalidar(amigo)
+
+    def aresta_adicionada(self, origem, destino):
+        self.invalidar(origem)
+
+    def aresta_removida(self, origem, destino):
+        self.invalidar(origem)
@@ -0,0 +1,274 @@
+"""Recomendacao aproximada para usuarios com muitos amigos.
+
+Para um usuario com grau `d` acima de `limiar_grau` o motor percorre so
+uma amostra uniforme de `m = ceil(ln(2 / (1 - confianca)) / (2 * erro**2))`
+amigos e estima os amigos em comum com cada candidato como
+`contagem_na_amostra * d / m`. Pela desigualdade de Hoeffding (que vale
+para amostra sem reposicao), cada estimativa erra no maximo `erro * d`
+amigos em comum com probabilidade `confianca`. E isso que `erro` limita:
+o erro absoluto da contagem, medido em fracao do grau do usuario.
+
+A estimativa nao distingue contagens mais proximas que `erro * d`, entao
+ela nao decide a regra de `minimo` (2) amigos em comum. Por isso:
+
+    - `recomendar(usuario)` mantem sempre a regra de `minimo` e conta de
+      forma exata, qualquer que seja o grau;
+    - `ranking(usuario, k)` devolve os `k` candidatos de maior estimativa,
+      cada um como `(nome, estimativa, margem)` com `margem = erro * d`
+      (0 quando a contagem foi exata);
+    - `recomendar(usuario, aproximado=True)` troca, so a pedido, a regra
+      por `corte(usuario) = max(minimo, erro * d)`. Com a `confianca` dada,
+      um candidato com `corte + erro * d` ou mais aparece e um com menos de
+      `corte - erro * d` fica de fora.
+
+O modo aproximado so e usado quando `m` e no maximo metade do grau: acima
+disso a contagem exata custa quase o mesmo e nao erra. Alem da contagem:
+
+    - `em_comum` estima os amigos em comum de dois usuarios acima do
+      limiar pelo MinHash (bottom-k, k = 1 / erro**2) das duas listas;
+      o erro padrao do Jaccard e no maximo `erro / 2`;
+    - `alcance` estima quantas pessoas estao a dois passos com
+      HyperLogLog (erro padrao relativo ~ `erro`).
+
+Os esbocos (MinHash e HyperLogLog da lista de amigos) so existem para
+usuarios acima do limiar, e sao atualizados a cada aresta: inserir custa
+O(log k); remover so reconstroi os esbocos quando o amigo removido estava
+entre os k menores hashes do MinHash ou quando as remocoes acumuladas
+passam de `erro` vezes o grau (o HyperLogLog nao sabe remover).
+"""
+
+import heapq
+import math
+import random
+from bisect import bisect_left, insort
+from collections import Counter
+from hashlib import blake2b
+
+MINIMO_EM_COMUM = 2
+LIMIAR_GRAU = 5_000
+ERRO = 0.05
+CONFIANCA = 0.95
+
+_MASCARA = (1 << 64) - 1
+
+
+def hash64(nome):
+    return int.from_bytes(blake2b(nome.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class MinHash:
+    """Os `k` menores hashes de um conjunto (bottom-k)."""
+
+    def __init__(self, k, hashes=()):
+        self.k = k
+        self.valores = heapq.nsmallest(k, set(hashes))
+
+    def adicionar(self, h):
+        valores = self.valores
+        if len(valores) < self.k or h < valores[-1]:
+            i = bisect_left(valores, h)
+            if i < len(valores) and valores[i] == h:
+                return
+            insort(valores, h)
+            del valores[self.k:]
+
+    def contem(self, h):
+        i = bisect_left(self.valores, h)
+        return i < len(self.valores) and self.valores[i] == h
+
+    def jaccard(self, outro):
+        uniao = heapq.nsmallest(self.k, set(self.valores).union(outro.valores))
+        if not uniao:
+            return 0.0
+        meus, deles = set(self.valores), set(outro.valores)
+        return sum(1 for h in uniao if h in meus and h in deles) / len(uniao)
+
+
+class HyperLogLog:
+    def __init__(self, precisao):
+        self.precisao = precisao
+        self.registros = bytearray(1 << precisao)
+
+    def adicionar(self, h):
+        indice = h >> (64 - self.precisao)
+        resto = (h << self.precisao) & _MASCARA
+        posicao = 65 - resto.bit_length() if resto else 65 - self.precisao
+        if posicao > self.registros[indice]:
+            self.registros[indice] = posicao
+
+    def unir(self, outro):
+        self.registros = bytearray(map(max, self.registros, outro.registros))
+
+    def estimar(self):
+        m = len(self.registros)
+        alfa = 0.7213 / (1 + 1.079 / m)
+        estimativa = alfa * m * m / sum(2.0 ** -r for r in self.registros)
+        vazios = self.registros.count(0)
+        if estimativa <= 2.5 * m and vazios:
+            return m * math.log(m / vazios)
+        return estimativa
+
+
+class MotorAproximado:
+    """Observador do `Grafo` que recomenda de forma exata para usuarios
+    comuns e aproximada acima de `limiar_grau` amigos."""
+
+    def __init__(self, rede, limiar_grau=LIMIAR_GRAU, erro=ERRO,
+                 minimo=MINIMO_EM_COMUM, semente=0, confianca=CONFIANCA):
+        self.rede = rede
+        self.limiar_grau = limiar_grau
+        self.erro = erro
+        self.minimo = minimo
+        self.confianca = confianca
+        self.k = math.ceil(1 / erro ** 2)
+        # Hoeffding: P(|estimativa - real| >= erro * grau) <= 2 exp(-2 m erro^2)
+        self.amostra = math.ceil(math.log(2 / (1 - confianca)) / (2 * erro ** 2))
+        # erro padrao do HLL ~ 1.04 / sqrt(m)
+        self.precisao = max(4, min(16, math.ceil(math.log2((1.04 / erro) ** 2))))
+        self.aleatorio = random.Random(semente)
+        self._hashes = {}
+        self._remocoes = Counter()
+        self.minhash = {}
+        self.hll = {}
+        for nome, amigos in rede.items():
+            if len(amigos) >= limiar_grau:
+                self._criar_esbocos(nome)
+
+    def _hash(self, nome):
+        h = self._hashes.get(nome)
+        if h is None:
+            h = self._hashes[nome] = hash64(nome)
+        return h
+
+    def _criar_esbocos(self, nome):
+        hashes = [self._hash(amigo) for amigo in self.rede[nome]]
+        self.minhash[nome] = MinHash(self.k, hashes)
+        hll = self.hll[nome] = HyperLogLog(self.precisao)
+        for h in hashes:
+            hll.adicionar(h)
+        self._remocoes.pop(nome, None)
+
+    def _descartar_esbocos(self, nome):
+        self.minhash.pop(nome, None)
+        self.hll.pop(nome, None)
+        self._remocoes.pop(nome, None)
+
+    # ------------------------------------------------------- observador
+
+    def usuario_adicionado(self, nome):
+        pass
+
+    def usuario_removido(self, nome, amigos):
+        self._descartar_esbocos(nome)
+        for amigo in amigos:
+            self.aresta_removida(amigo, nome)
+        # so depois: `aresta_removida` ainda consulta o hash do nome
+        self._hashes.pop(nome, None)
+
+    def aresta_adicionada(self, origem, destino):
+        if origem in self.minhash:
+            h = self._hash(destino)
+            self.minhash[origem].adicionar(h)
+            self.hll[origem].adicionar(h)
+        elif len(self.rede[origem]) >= self.limiar_grau:
+            self._criar_esbocos(origem)
+
+    def aresta_removida(self, origem, destino):
+        if origem not in self.minhash:
+            return
+        grau = len(self.rede[origem])
+        self._remocoes[origem] += 1
+        # histerese: so descarta bem abaixo do limiar
+        if grau < self.limiar_grau // 2:
+            self._descartar_esbocos(origem)
+        # HyperLogLog nao remove: reconstroi quando as remocoes passam do erro
+        elif (self.minhash[origem].contem(self._hash(destino))
+              or self._remocoes[origem] > self.erro * grau):
+            self._criar_esbocos(origem)
+
+    # ---------------------------------------------------------- leitura
+
+    def em_comum(self, usuario, candidato):
+        """Amigos em comum, exato se um dos dois tem poucos amigos."""
+        meus, deles = self.rede[usuario], self.rede[candidato]
+        if len(meus) > len(deles):
+            meus, deles = deles, meus
+        if len(meus) < self.limiar_grau or usuario not in self.minhash or candidato not in self.minhash:
+            return sum(1 for amigo in meus if amigo in deles)
+        jaccard = self.minhash[usuario].jaccard(self.minhash[candidato])
+        return jaccard / (1 + jaccard) * (len(meus) + len(deles))
+
+    def contagem_exata(self, usuario):
+        seus_amigos = self.rede[usuario]
+        contagem = Counter()
+        for amigo in seus_amigos:
+            contagem.update(self.rede[amigo])
+        contagem.pop(usuario, None)
+        for amigo in seus_amigos:
+            contagem.pop(amigo, None)
+        return contagem
+
+    def contagem_aproximada(self, usuario):
+        """Estimativa dos amigos em comum com cada candidato visto na
+        amostra; erro de no maximo `erro * grau` com a `confianca` dada."""
+        seus_amigos = self.rede[usuario]
+        amostra = self.aleatorio.sample(list(seus_amigos), min(self.amostra, len(seus_amigos)))
+        fator = len(seus_amigos) / len(amostra)
+        contagem = Counter()
+        for amigo in amostra:
+            contagem.update(self.rede[amigo])
+        contagem.pop(usuario, None)
+        for amigo in seus_amigos:
+            contagem.pop(amigo, None)
+        return {candidato: qtd * fator for candidato, qtd in contagem.items()}
+
+    def aproximado(self, usuario):
+        grau = len(self.rede[usuario])
+        return grau >= self.limiar_grau and 2 * self.amostra <= grau
+
+    def margem(self, usuario):
+        """Erro maximo (com a `confianca` dada) da contagem de `usuario`."""
+        if self.aproximado(usuario):
+            return self.erro * len(self.rede[usuario])
+        return 0
+
+    def corte(self, usuario):
+        """Minimo de amigos em comum de `recomendar(usuario, aproximado=True)`."""
+        if self.aproximado(usuario):
+            return max(self.minimo, self.margem(usuario))
+        return self.minimo
+
+    def ranking(self, usuario, k=10):
+        """Os `k` candidatos de maior contagem (estimada acima do limiar),
+        como `(nome, estimativa, margem)`."""
+        if self.aproximado(usuario):
+            contagem = self.contagem_aproximada(usuario)
+        else:
+            contagem = self.contagem_exata(usuario)
+        margem = self.margem(usuario)
+        melhores = heapq.nsmallest(k, contagem.items(), key=lambda item: (-item[1], item[0]))
+        return [(nome, qtd, margem) for nome, qtd in melhores]
+
+    def recomendar(self, usuario, aproximado=False):
+        """Candidatos com pelo menos `minimo` amigos em comum, em ordem
+        alfabetica. Com `aproximado=True`, usuarios acima do limiar usam a
+        amostra e o `corte(usuario)`, mais alto."""
+        if aproximado and self.aproximado(usuario):
+            contagem = self.contagem_aproximada(usuario)
+            corte = self.corte(usuario)
+        else:
+            contagem = self.contagem_exata(usuario)
+            corte = self.minimo
+        return sorted(nome for nome, qtd in contagem.items() if qtd >= corte)
+
+    def alcance(self, usuario):
+        """Estimativa de quantas pessoas distintas sao amigas dos amigos de
+        `usuario` (incluindo o proprio e os amigos em comum)."""
+        uniao = HyperLogLog(self.precisao)
+        for amigo in self.rede[usuario]:
+            if amigo in self.hll:
+                uniao.unir(self.hll[amigo])
+            else:
+                for amigo_de_amigo in self.rede[amigo]:
+                    uniao.adicionar(self._hash(amigo_de_amigo))
+        return uniao.estimar()
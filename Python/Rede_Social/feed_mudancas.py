@@ -0,0 +1,179 @@
+"""Feed de mudancas da rede, para caches e indices externos.
+
+O feed e um observador do `Grafo`: cada mudanca recebe um numero de
+sequencia crescente e fica num buffer circular com os ultimos
+`capacidade` eventos. Os eventos sao entregues no fim de cada mudanca do
+grafo (`mudanca_concluida`), em lotes de ate `tamanho_lote`; dentro de
+`with feed.agrupar():` a entrega fica para a saida do bloco, o que serve
+para cargas em lote. Consumidores pegam os eventos em lotes e podem
+retomar de onde pararam passando o ultimo `seq` que viram; se esse ponto
+ja saiu do buffer, `HistoricoPerdido` avisa que e preciso reler a rede.
+Erros de um assinante nunca chegam ao grafo: a assinatura e cancelada e
+guarda o motivo (veja `assinar`).
+
+    feed = FeedMudancas()
+    rede.observadores.append(feed)
+
+    feed.assinar(lambda lote: ...)           # callback sincrono, por lote
+    async for lote in feed.acompanhar(seq):  # iterador assincrono
+        ...
+"""
+
+import asyncio
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from itertools import count, islice
+
+CAPACIDADE = 100_000
+TAMANHO_LOTE = 256
+
+Evento = namedtuple("Evento", "seq tipo args")
+
+
+class HistoricoPerdido(LookupError):
+    pass
+
+
+class Assinatura:
+    def __init__(self, feed, callback, tamanho_lote, perdida=None):
+        self.feed = feed
+        self.callback = callback
+        self.tamanho_lote = tamanho_lote
+        self.perdida = perdida
+        self.ultimo = feed.ultimo_seq
+        self.erro = None
+
+    def entregar(self):
+        for lote in self.feed.lotes_desde(self.ultimo, self.tamanho_lote):
+            self.callback(lote)
+            self.ultimo = lote[-1].seq
+
+    def cancelar(self):
+        if self in self.feed.assinaturas:
+            self.feed.assinaturas.remove(self)
+
+    def _falhar(self, erro):
+        """Cancela a assinatura guardando o motivo em `erro`; quem assinou
+        reassina a partir de `ultimo` ou, com `HistoricoPerdido`, rele a
+        rede. `perdida(assinatura)` e avisado se foi dado."""
+        self.erro = erro
+        self.cancelar()
+        if self.perdida is not None:
+            try:
+                self.perdida(self)
+            except Exception:
+                pass
+
+
+class FeedMudancas:
+    def __init__(self, capacidade=CAPACIDADE, tamanho_lote=TAMANHO_LOTE):
+        self.eventos = deque(maxlen=capacidade)
+        self.tamanho_lote = tamanho_lote
+        self.assinaturas = []
+        self._seq = count(1)
+        self.ultimo_seq = 0
+        self._pendentes = 0
+        self._agrupando = 0
+        self._despertadores = set()
+
+    def _publicar(self, tipo, *args):
+        self.ultimo_seq = next(self._seq)
+        self.eventos.append(Evento(self.ultimo_seq, tipo, args))
+        self._pendentes += 1
+        # o lote nunca passa do buffer, senao o comeco dele ja teria saido
+        if self._pendentes >= min(self.tamanho_lote, self.eventos.maxlen):
+            self.liberar()
+
+    def mudanca_concluida(self):
+        if self._pendentes and not self._agrupando:
+            self.liberar()
+
+    @contextmanager
+    def agrupar(self):
+        """Segura a entrega ate o fim do bloco (ou ate juntar um lote
+        cheio)."""
+        self._agrupando += 1
+        try:
+            yield self
+        finally:
+            self._agrupando -= 1
+            if not self._agrupando and self._pendentes:
+                self.liberar()
+
+    def liberar(self):
+        """Entrega o que estiver pendente aos assinantes e acorda os
+        iteradores assincronos."""
+        self._pendentes = 0
+        for assinatura in list(self.assinaturas):
+            # roda no fim de uma mudanca do grafo, que ja foi aplicada: um
+            # assinante atrasado ou com defeito nao pode fazer ela falhar
+            try:
+                assinatura.entregar()
+            except Exception as erro:
+                assinatura._falhar(erro)
+        for loop, evento in list(self._despertadores):
+            loop.call_soon_threadsafe(evento.set)
+
+    # ---------------------------------------------------------- leitura
+
+    def eventos_desde(self, seq=0, limite=None):
+        """Eventos com numero maior que `seq`, do mais antigo ao mais novo."""
+        if seq >= self.ultimo_seq:
+            return []
+        primeiro = self.eventos[0].seq if self.eventos else self.ultimo_seq + 1
+        if seq + 1 < primeiro:
+            raise HistoricoPerdido(
+                f"Eventos a partir de {seq + 1} ja sairam do buffer (mais antigo: {primeiro})"
+            )
+        inicio = seq + 1 - primeiro
+        fim = len(self.eventos) if limite is None else min(len(self.eventos), inicio + limite)
+        return list(islice(self.eventos, inicio, fim))
+
+    def lotes_desde(self, seq, tamanho_lote=None):
+        tamanho_lote = tamanho_lote or self.tamanho_lote
+        while lote := self.eventos_desde(seq, tamanho_lote):
+            yield lote
+            seq = lote[-1].seq
+
+    def assinar(self, callback, desde=None, tamanho_lote=None, perdida=None):
+        """Registra `callback(lote)`. Com `desde`, reentrega primeiro o que
+        veio depois desse numero de sequencia. Se o assinante ficar para
+        tras do buffer ou o callback levantar erro, a assinatura e
+        cancelada, com o motivo em `erro`, e `perdida(assinatura)` e
+        chamado."""
+        assinatura = Assinatura(self, callback, tamanho_lote or self.tamanho_lote, perdida)
+        if desde is not None:
+            assinatura.ultimo = desde
+            assinatura.entregar()
+        self.assinaturas.append(assinatura)
+        return assinatura
+
+    async def acompanhar(self, desde=None, tamanho_lote=None):
+        """Gera lotes de eventos para sempre, esperando quando nao ha nada
+        novo. Comeca do fim do feed se `desde` nao for dado."""
+        seq = self.ultimo_seq if desde is None else desde
+        acordar = (asyncio.get_running_loop(), asyncio.Event())
+        self._despertadores.add(acordar)
+        try:
+            while True:
+                acordar[1].clear()
+                for lote in self.lotes_desde(seq, tamanho_lote):
+                    yield lote
+                    seq = lote[-1].seq
+                await acordar[1].wait()
+        finally:
+            self._despertadores.discard(acordar)
+
+    # ------------------------------------------------------- observador
+
+    def usuario_adicionado(self, nome):
+        self._publicar("usuario_adicionado", nome)
+
+    def usuario_removido(self, nome, amigos):
+        self._publicar("usuario_removido", nome, tuple(sorted(amigos)))
+
+    def aresta_adicionada(self, origem, destino):
+        self._publicar("aresta_adicionada", origem, destino)
+
+    def aresta_removida(self, origem, destino):
+        self._publicar("aresta_removida", origem, destino)
@@ -0,0 +1,348 @@
+"""Rede particionada entre varios processos trabalhadores.
+
+Cada trabalhador guarda so os usuarios do seu fragmento (e a lista de
+amigos deles) e atende pedidos por `multiprocessing.connection` em
+localhost. O `Coordenador` decide o dono de cada usuario - por hash do
+nome ou por uma tabela de particao calculada por comunidades - e responde a
+recomendacao em duas rodadas de scatter/gather:
+
+    1. pede ao dono do usuario a lista de amigos dele;
+    2. manda a cada fragmento os amigos que ele possui e recebe a contagem
+       parcial de amigos de amigos; soma as parciais, tira o proprio
+       usuario e os amigos e aplica o minimo e a ordem de `recomendacao`.
+
+Trabalhadores podem rodar em terminais separados, com a mesma chave na
+variavel de ambiente `REDE_FRAGMENTOS_CHAVE`:
+
+    export REDE_FRAGMENTOS_CHAVE=$(python -c "import secrets; print(secrets.token_hex(32))")
+    python fragmentos.py --porta 7001
+    python fragmentos.py --porta 7002
+
+ou ser iniciados pelo proprio coordenador com `iniciar_trabalhadores`,
+passando uma chave gerada na hora:
+
+    chave = nova_chave()
+    processos, enderecos = iniciar_trabalhadores(4, chave=chave)
+    coordenador = Coordenador(enderecos, chave=chave)
+
+So quem tem a chave conversa com os trabalhadores, e eles so executam os
+comandos de `COMANDOS`.
+"""
+
+import argparse
+import os
+import random
+import secrets
+import time
+import zlib
+from collections import Counter, defaultdict
+from multiprocessing import AuthenticationError, Process
+from multiprocessing.connection import Client, Listener
+
+HOST = "127.0.0.1"
+VARIAVEL_CHAVE = "REDE_FRAGMENTOS_CHAVE"
+MINIMO_EM_COMUM = 2
+
+# metodos do `Fragmento` que o coordenador pode chamar
+COMANDOS = frozenset({
+    "carregar", "existe", "adicionar_usuario", "remover_usuario", "ligar",
+    "desligar", "retirar", "amigos", "contar", "tamanho",
+})
+
+
+class ErroFragmento(RuntimeError):
+    pass
+
+
+def nova_chave():
+    return secrets.token_bytes(32)
+
+
+def _chave(chave=None):
+    """A chave dada ou a de `REDE_FRAGMENTOS_CHAVE`; nunca uma fixa."""
+    if chave is None:
+        chave = os.environ.get(VARIAVEL_CHAVE)
+        if not chave:
+            raise ErroFragmento(f"Defina {VARIAVEL_CHAVE} ou passe uma chave (nova_chave())")
+    if isinstance(chave, str):
+        chave = chave.encode("utf-8")
+    return chave
+
+
+# ------------------------------------------------------------ trabalhador
+
+class Fragmento:
+    def __init__(self):
+        self.rede = {}
+
+    def carregar(self, parte):
+        for nome, amigos in parte.items():
+            self.rede.setdefault(nome, set()).update(amigos)
+
+    def existe(self, nome):
+        return nome in self.rede
+
+    def adicionar_usuario(self, nome):
+        if nome in self.rede:
+            return False
+        self.rede[nome] = set()
+        return True
+
+    def remover_usuario(self, nome):
+        return self.rede.pop(nome, set())
+
+    def ligar(self, usuario, amigo):
+        self.rede[usuario].add(amigo)
+
+    def desligar(self, usuario, amigo):
+        if usuario in self.rede:
+            self.rede[usuario].discard(amigo)
+
+    def retirar(self, nome, amigos):
+        for amigo in amigos:
+            self.desligar(amigo, nome)
+
+    def amigos(self, nome):
+        return self.rede.get(nome)
+
+    def contar(self, amigos):
+        """Contagem parcial: para cada amigo deste fragmento, soma os amigos
+        dele."""
+        contagem = Counter()
+        for amigo in amigos:
+            contagem.update(self.rede.get(amigo, ()))
+        return contagem
+
+    def tamanho(self):
+        return len(self.rede), sum(len(amigos) for amigos in self.rede.values())
+
+
+def servir_fragmento(porta, host=HOST, chave=None):
+    fragmento = Fragmento()
+    with Listener((host, porta), authkey=_chave(chave)) as ouvinte:
+        while True:
+            try:
+                conexao = ouvinte.accept()
+            except (AuthenticationError, EOFError, OSError):
+                # quem nao tem a chave e recusado sem derrubar o trabalhador
+                continue
+            with conexao:
+                while True:
+                    try:
+                        comando, argumentos = conexao.recv()
+                    except EOFError:
+                        break
+                    if comando == "encerrar":
+                        conexao.send(("ok", None))
+                        return
+                    if comando not in COMANDOS:
+                        conexao.send(("erro", f"Comando invalido: {comando!r}"))
+                        continue
+                    try:
+                        conexao.send(("ok", getattr(fragmento, comando)(*argumentos)))
+                    except Exception as erro:
+                        conexao.send(("erro", repr(erro)))
+
+
+def iniciar_trabalhadores(quantidade, porta_inicial=7001, host=HOST, chave=None):
+    """Sobe `quantidade` trabalhadores locais e devolve (processos, enderecos)."""
+    chave = _chave(chave)
+    processos, enderecos = [], []
+    for i in range(quantidade):
+        porta = porta_inicial + i
+        processo = Process(target=servir_fragmento, args=(porta, host, chave), daemon=True)
+        processo.start()
+        processos.append(processo)
+        enderecos.append((host, porta))
+    return processos, enderecos
+
+
+# ---------------------------------------------------------------- particao
+
+def fragmento_por_hash(nome, quantidade):
+    # crc32 e estavel entre processos, ao contrario de hash()
+    return zlib.crc32(nome.encode("utf-8")) % quantidade
+
+
+def particionar_por_comunidade(rede, quantidade, rodadas=10, semente=0):
+    """Propagacao de rotulos para achar comunidades e distribuicao gulosa
+    das comunidades, da maior para a menor, no fragmento mais vazio, sem
+    passar de `len(rede) / quantidade` usuarios por fragmento.
+    Amigos tendem a cair no mesmo fragmento, o que diminui a conversa na
+    segunda rodada da recomendacao."""
+    aleatorio = random.Random(semente)
+    rotulo = {nome: nome for nome in rede}
+    ordem = list(rede)
+    for _ in range(rodadas):
+        aleatorio.shuffle(ordem)
+        mudou = False
+        for nome in ordem:
+            if not rede[nome]:
+                continue
+            votos = Counter(rotulo[amigo] for amigo in rede[nome] if amigo in rotulo)
+            if not votos:
+                continue
+            melhor = max(votos.values())
+            novo = min(r for r, qtd in votos.items() if qtd == melhor)
+            if novo != rotulo[nome]:
+                rotulo[nome] = novo
+                mudou = True
+        if not mudou:
+            break
+
+    comunidades = defaultdict(list)
+    for nome, r in rotulo.items():
+        comunidades[r].append(nome)
+    # comunidade maior que a capacidade transborda para o proximo fragmento
+    capacidade = -(-len(rede) // quantidade)
+    cargas = [0] * quantidade
+    particao = {}
+    for membros in sorted(comunidades.values(), key=len, reverse=True):
+        destino = cargas.index(min(cargas))
+        for nome in membros:
+            if cargas[destino] >= capacidade:
+                destino = cargas.index(min(cargas))
+            particao[nome] = destino
+            cargas[destino] += 1
+    return particao
+
+
+# ------------------------------------------------------------- coordenador
+
+def _conectar(endereco, chave, espera=5.0):
+    # o trabalhador pode ainda estar subindo
+    limite = time.monotonic() + espera
+    while True:
+        try:
+            return Client(endereco, authkey=chave)
+        except ConnectionRefusedError:
+            if time.monotonic() > limite:
+                raise
+            time.sleep(0.05)
+
+
+class Coordenador:
+    def __init__(self, enderecos, particao=None, chave=None, minimo=MINIMO_EM_COMUM):
+        chave = _chave(chave)
+        self.conexoes = [_conectar(endereco, chave) for endereco in enderecos]
+        self.particao = particao or {}
+        self.minimo = minimo
+
+    def fechar(self):
+        for conexao in self.conexoes:
+            conexao.close()
+
+    def encerrar_trabalhadores(self):
+        for conexao in self.conexoes:
+            conexao.send(("encerrar", ()))
+            conexao.recv()
+        self.fechar()
+
+    def dono(self, nome):
+        destino = self.particao.get(nome)
+        if destino is None:
+            destino = fragmento_por_hash(nome, len(self.conexoes))
+        return destino
+
+    def _receber(self, conexao):
+        estado, resposta = conexao.recv()
+        if estado != "ok":
+            raise ErroFragmento(resposta)
+        return resposta
+
+    def _pedir(self, destino, comando, *argumentos):
+        conexao = self.conexoes[destino]
+        conexao.send((comando, argumentos))
+        return self._receber(conexao)
+
+    def _espalhar(self, pedidos):
+        """Envia `{destino: (comando, argumentos)}` a todos antes de esperar
+        qualquer resposta, para os fragmentos trabalharem ao mesmo tempo."""
+        for destino, pedido in pedidos.items():
+            self.conexoes[destino].send(pedido)
+        # todas as respostas sao lidas antes de levantar qualquer erro: uma
+        # resposta deixada na conexao seria lida pelo proximo pedido
+        respostas = {destino: self.conexoes[destino].recv() for destino in pedidos}
+        for estado, resposta in respostas.values():
+            if estado != "ok":
+                raise ErroFragmento(resposta)
+        return {destino: resposta for destino, (_, resposta) in respostas.items()}
+
+    def _agrupar(self, nomes):
+        grupos = defaultdict(list)
+        for nome in nomes:
+            grupos[self.dono(nome)].append(nome)
+        return grupos
+
+    # ---------------------------------------------------------- escrita
+
+    def carregar(self, rede):
+        partes = defaultdict(dict)
+        for nome, amigos in rede.items():
+            partes[self.dono(nome)][nome] = list(amigos)
+        self._espalhar({destino: ("carregar", (parte,)) for destino, parte in partes.items()})
+
+    def existe(self, nome):
+        return self._pedir(self.dono(nome), "existe", nome)
+
+    def adicionar_usuario(self, nome):
+        return self._pedir(self.dono(nome), "adicionar_usuario", nome)
+
+    def remover_usuario(self, nome):
+        amigos = self._pedir(self.dono(nome), "remover_usuario", nome)
+        self._espalhar({
+            destino: ("retirar", (nome, grupo))
+            for destino, grupo in self._agrupar(amigos).items()
+        })
+        return amigos
+
+    def adicionar_amizade(self, usuario, amigo):
+        if usuario == amigo or not (self.existe(usuario) and self.existe(amigo)):
+            return False
+        self._pedir(self.dono(usuario), "ligar", usuario, amigo)
+        self._pedir(self.dono(amigo), "ligar", amigo, usuario)
+        return True
+
+    def remover_amizade(self, usuario, amigo):
+        self._pedir(self.dono(usuario), "desligar", usuario, amigo)
+        self._pedir(self.dono(amigo), "desligar", amigo, usuario)
+
+    # ---------------------------------------------------------- leitura
+
+    def amigos(self, nome):
+        return self._pedir(self.dono(nome), "amigos", nome)
+
+    def contagem(self, usuario):
+        seus_amigos = self.amigos(usuario)
+        if seus_amigos is None:
+            raise KeyError(usuario)
+        pedidos = {
+            destino: ("contar", (grupo,))
+            for destino, grupo in self._agrupar(seus_amigos).items()
+        }
+        contagem = Counter()
+        for parcial in self._espalhar(pedidos).values():
+            contagem.update(parcial)
+        contagem.pop(usuario, None)
+        for amigo in seus_amigos:
+            contagem.pop(amigo, None)
+        return contagem
+
+    def recomendar(self, usuario):
+        return sorted(nome for nome, qtd in self.contagem(usuario).items() if qtd >= self.minimo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trabalhador de um fragmento da rede")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--porta", type=int, required=True)
+    args = parser.parse_args()
+    try:
+        chave = _chave()
+    except ErroFragmento as erro:
+        parser.error(str(erro))
+    servir_fragmento(args.porta, args.host, chave)
+
+
+if __name__ == "__main__":
+    main()
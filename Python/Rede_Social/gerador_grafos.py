@@ -0,0 +1,86 @@
+"""Geradores de redes sinteticas reprodutiveis (mesma semente, mesma rede).
+
+Todos devolvem um dict `{nome: set(amigos)}` simetrico, que pode ser usado
+direto pelo `MotorRecomendacao` ou virar um `Grafo`.
+"""
+
+import random
+
+
+def _nome(i):
+    return f"u{i:07d}"
+
+
+def _rede_vazia(n):
+    return {_nome(i): set() for i in range(n)}
+
+
+def _ligar(rede, a, b):
+    if a != b:
+        rede[_nome(a)].add(_nome(b))
+        rede[_nome(b)].add(_nome(a))
+
+
+def barabasi_albert(n, m=3, semente=0):
+    """Anexacao preferencial: cada usuario novo faz `m` amizades, escolhendo
+    com probabilidade proporcional ao grau. Graus seguem lei de potencia."""
+    aleatorio = random.Random(semente)
+    rede = _rede_vazia(n)
+    # cada ponta de aresta aparece uma vez aqui, entao sortear desta lista
+    # e sortear proporcional ao grau
+    pontas = list(range(min(m, n)))
+    for novo in range(m, n):
+        escolhidos = set()
+        while len(escolhidos) < m:
+            escolhidos.add(aleatorio.choice(pontas))
+        for alvo in escolhidos:
+            _ligar(rede, novo, alvo)
+            pontas.extend((novo, alvo))
+    return rede
+
+
+def erdos_renyi(n, grau_medio=6, semente=0):
+    """G(n, m) com m = n * grau_medio / 2 amizades sorteadas uniformemente."""
+    aleatorio = random.Random(semente)
+    rede = _rede_vazia(n)
+    if n < 2:
+        return rede
+    arestas = min(n * grau_medio // 2, n * (n - 1) // 2)
+    feitas = 0
+    while feitas < arestas:
+        a, b = aleatorio.randrange(n), aleatorio.randrange(n)
+        if a != b and _nome(b) not in rede[_nome(a)]:
+            _ligar(rede, a, b)
+            feitas += 1
+    return rede
+
+
+def watts_strogatz(n, k=6, beta=0.1, semente=0):
+    """Mundo pequeno: anel onde cada usuario e amigo dos `k` vizinhos mais
+    proximos; cada amizade e religada a um usuario aleatorio com
+    probabilidade `beta`."""
+    aleatorio = random.Random(semente)
+    rede = _rede_vazia(n)
+    for i in range(n):
+        for salto in range(1, k // 2 + 1):
+            _ligar(rede, i, (i + salto) % n)
+
+    for i in range(n):
+        for salto in range(1, k // 2 + 1):
+            j = (i + salto) % n
+            if aleatorio.random() >= beta or _nome(j) not in rede[_nome(i)]:
+                continue
+            novo = aleatorio.randrange(n)
+            if novo == i or _nome(novo) in rede[_nome(i)]:
+                continue
+            rede[_nome(i)].discard(_nome(j))
+            rede[_nome(j)].discard(_nome(i))
+            _ligar(rede, i, novo)
+    return rede
+
+
+GERADORES = {
+    "erdos_renyi": erdos_renyi,
+    "barabasi_albert": barabasi_albert,
+    "watts_strogatz": watts_strogatz,
+}
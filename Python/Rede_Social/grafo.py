@@ -0,0 +1,178 @@
+"""Grafo de amizades simetrico e consistente.
+
+Substitui o dict cru `{usuario: set(amigos)}`: toda amizade existe nos dois
+sentidos, so liga usuarios cadastrados, e remover um usuario apaga o nome
+dele apenas das listas dos proprios amigos - O(grau), sem varrer a rede.
+
+Para leitura o grafo se comporta como o dict antigo (`in`, `rede[nome]`,
+`items()`, ...). As mudancas passam pelos metodos abaixo, que avisam os
+`observadores` (indice de amigos em comum, armazenamento, ...) com os
+eventos `usuario_adicionado`, `usuario_removido`, `aresta_adicionada` e
+`aresta_removida`. Uma amizade gera duas arestas, uma em cada sentido,
+avisadas uma de cada vez; no fim de cada mudanca os observadores que tem
+`mudanca_concluida` sao chamados.
+
+Os nomes tambem ficam numa `ListaOrdenada`, para listar a rede em ordem
+alfabetica sem ordenar tudo a cada listagem.
+"""
+
+import sys
+from array import array
+from collections.abc import Mapping
+from itertools import islice
+
+from lista_ordenada import ListaOrdenada
+
+
+class ErroGrafo(ValueError):
+    pass
+
+
+class Grafo(Mapping):
+    def __init__(self, rede=None):
+        self._adjacencia = {}
+        self.observadores = []
+        for nome, amigos in (rede or {}).items():
+            self._adjacencia.setdefault(nome, set())
+            for amigo in amigos:
+                if amigo != nome:
+                    self._adjacencia[nome].add(amigo)
+                    self._adjacencia.setdefault(amigo, set()).add(nome)
+        self._ordenados = ListaOrdenada(self._adjacencia)
+
+    @classmethod
+    def de_csr(cls, nomes, usuarios, indptr, indices):
+        """Monta o grafo direto do CSR do snapshot, que ja e simetrico: uma
+        passada, sem conferir o outro sentido de cada amizade. Entram os
+        nomes marcados em `usuarios` e os que tem amigos."""
+        grafo = cls.__new__(cls)
+        grafo.observadores = []
+        pegar = nomes.__getitem__
+        grafo._adjacencia = {
+            nome: set(map(pegar, indices[indptr[uid]:indptr[uid + 1]]))
+            for uid, nome in enumerate(nomes)
+            if usuarios[uid] or indptr[uid] != indptr[uid + 1]
+        }
+        grafo._ordenados = ListaOrdenada(grafo._adjacencia)
+        return grafo
+
+    def para_csr(self):
+        """O inverso de `de_csr`: (nomes em ordem alfabetica, usuarios,
+        indptr, indices), o que o snapshot grava."""
+        nomes = set(self)
+        for amigos in self.values():
+            nomes.update(amigos)
+        nomes = sorted(nomes)
+        ids = {nome: i for i, nome in enumerate(nomes)}
+
+        usuarios = bytes(1 if nome in self else 0 for nome in nomes)
+        indptr = array("q", [0])
+        indices = array("I")
+        for nome in nomes:
+            indices.extend(sorted(ids[amigo] for amigo in self.get(nome, ())))
+            indptr.append(len(indices))
+        return nomes, usuarios, indptr, indices
+
+    def __getitem__(self, nome):
+        return self._adjacencia[nome]
+
+    def __iter__(self):
+        return iter(self._adjacencia)
+
+    def __len__(self):
+        return len(self._adjacencia)
+
+    def total_amizades(self):
+        return sum(len(amigos) for amigos in self._adjacencia.values()) // 2
+
+    def _notificar(self, evento, *args):
+        for observador in self.observadores:
+            getattr(observador, evento)(*args)
+
+    def _concluir(self):
+        # fim de uma mudanca (uma amizade sao duas arestas): quem acumula
+        # eventos, como o feed, pode entrega-los agora
+        for observador in self.observadores:
+            concluida = getattr(observador, "mudanca_concluida", None)
+            if concluida is not None:
+                concluida()
+
+    def _validar(self, *nomes):
+        for nome in nomes:
+            if nome not in self._adjacencia:
+                raise ErroGrafo(f"Usuario {nome} nao existe")
+
+    def adicionar_usuario(self, nome):
+        if nome in self._adjacencia:
+            return False
+        self._adjacencia[nome] = set()
+        self._ordenados.adicionar(nome)
+        self._notificar("usuario_adicionado", nome)
+        self._concluir()
+        return True
+
+    def remover_usuario(self, nome):
+        self._validar(nome)
+        amigos = self._adjacencia.pop(nome)
+        self._ordenados.remover(nome)
+        for amigo in amigos:
+            self._adjacencia[amigo].discard(nome)
+        self._notificar("usuario_removido", nome, amigos)
+        self._concluir()
+        return amigos
+
+    def adicionar_amizade(self, usuario, amigo):
+        self._validar(usuario, amigo)
+        if usuario == amigo:
+            raise ErroGrafo("Um usuario nao pode ser amigo de si mesmo")
+        if amigo in self._adjacencia[usuario]:
+            return False
+        for origem, destino in ((usuario, amigo), (amigo, usuario)):
+            self._adjacencia[origem].add(destino)
+            self._notificar("aresta_adicionada", origem, destino)
+        self._concluir()
+        return True
+
+    def remover_amizade(self, usuario, amigo):
+        self._validar(usuario, amigo)
+        if amigo not in self._adjacencia[usuario]:
+            return False
+        for origem, destino in ((usuario, amigo), (amigo, usuario)):
+            self._adjacencia[origem].discard(destino)
+            self._notificar("aresta_removida", origem, destino)
+        self._concluir()
+        return True
+
+    def usuarios_ordenados(self, prefixo="", depois=None):
+        """Nomes em ordem alfabetica que comecam com `prefixo`, a partir do
+        nome seguinte a `depois` (o cursor), gerados um a um."""
+        if depois is None or depois < prefixo:
+            nomes = self._ordenados.a_partir_de(prefixo)
+        else:
+            nomes = self._ordenados.a_partir_de(depois, inclusivo=False)
+        for nome in nomes:
+            if not nome.startswith(prefixo):
+                return
+            yield nome
+
+    def pagina_usuarios(self, limite, cursor=None, prefixo=""):
+        """Retorna `(nomes, proximo_cursor)`; o cursor e None na ultima pagina."""
+        pagina = list(islice(self.usuarios_ordenados(prefixo, cursor), limite + 1))
+        if len(pagina) <= limite:
+            return pagina, None
+        return pagina[:limite], pagina[limite - 1]
+
+    def bytes_memoria(self):
+        """Memoria da rede: o dict, os sets, as `str` dos nomes e a lista
+        ordenada. Uma `str` que aparece em varias listas e o mesmo objeto,
+        entao conta uma vez so; o `GrafoCompacto` conta as mesmas coisas."""
+        nomes = {id(nome): nome for nome in self._adjacencia}
+        total = sys.getsizeof(self._adjacencia) + self._ordenados.bytes_listas()
+        for amigos in self._adjacencia.values():
+            total += sys.getsizeof(amigos)
+            nomes.update((id(amigo), amigo) for amigo in amigos)
+        return total + sum(sys.getsizeof(nome) for nome in nomes.values())
+
+    def bytes_por_aresta(self):
+        amizades = self.total_amizades()
+        return self.bytes_memoria() / amizades if amizades else 0.0
@@ -0,0 +1,466 @@
+"""Grafo de amizades compacto, com nomes internados em ids.
+
+Nada aqui e um objeto Python por usuario ou por amizade; tudo fica em
+poucos blocos planos, como no snapshot de `armazenamento`:
+
+    _texto      bytearray com os nomes em utf-8, cada um seguido de "\\n"
+    _inicio     array("Q"): onde comeca o nome de cada id em `_texto`
+    _tabela     array("I"): tabela hash (enderecamento aberto) nome -> id + 1
+    _ordenados  `ListaOrdenada` de ids, em ordem alfabetica dos nomes
+    _indptr     int64: a lista de amigos do id `i` e
+    _indices    uint32: `_indices[_indptr[i]:_indptr[i + 1]]`, ordenada
+
+`_indptr`/`_indices` sao memoryviews, entao podem ser o proprio CSR do
+snapshot mapeado. Mudancas nao mexem nele: a primeira mudanca na lista de
+um id copia a lista para o buffer de escrita (`_buffer`, id -> array
+ordenado), que passa a valer para aquele id. Quando o buffer passa de
+1/8 do CSR, os dois sao juntados num CSR novo. Ids de usuarios removidos
+sao reaproveitados.
+
+Por fora tem a mesma interface do `Grafo`, entao o menu, os observadores
+e a listagem funcionam sem mudanca. Nomes nao podem ter "\\n", como no
+snapshot.
+"""
+
+import sys
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Set
+from itertools import accumulate, repeat
+
+from grafo import ErroGrafo, Grafo
+from lista_ordenada import ListaOrdenada
+
+MINIMO_EM_COMUM = 2
+# marcas da tabela hash e de `_inicio`
+REMOVIDO = 0xFFFFFFFF
+AUSENTE = 0xFFFFFFFFFFFFFFFF
+BUFFER_MINIMO = 1 << 16
+
+
+def _copia(linha):
+    """Array novo com os ids de `linha` (memoryview do CSR, array ou ())."""
+    if isinstance(linha, memoryview):
+        nova = array("I")
+        nova.frombytes(linha.cast("B"))
+        return nova
+    return array("I", linha)
+
+
+class AmigosCompactos(Set):
+    """Visao somente leitura dos amigos de um id, em nomes."""
+
+    def __init__(self, grafo, uid):
+        self._grafo = grafo
+        self._uid = uid
+
+    def __len__(self):
+        return len(self._grafo._linha(self._uid))
+
+    def __iter__(self):
+        return map(self._grafo._nome, self._grafo._linha(self._uid))
+
+    def __contains__(self, nome):
+        amigo = self._grafo._id(nome)
+        return amigo is not None and self._grafo._sao_amigos(self._uid, amigo)
+
+
+class GrafoCompacto(Grafo):
+    def __init__(self, rede=None):
+        self.observadores = []
+        self._texto = bytearray()
+        self._inicio = array("Q")
+        self._tabela = array("I", bytes(4 * 8))
+        self._ocupados = 0
+        self._livres = array("I")
+        self._lixo = 0
+        self._ordenados = ListaOrdenada(chave=self._nome, tipo="I")
+        self._indptr = memoryview(array("q", [0]))
+        self._indices = memoryview(array("I"))
+        self._buffer = {}
+        self._no_buffer = 0
+        self._entradas = 0
+        if rede:
+            ids = {}
+            for nome in rede:
+                ids.setdefault(nome, len(ids))
+            for amigos in rede.values():
+                for amigo in amigos:
+                    ids.setdefault(amigo, len(ids))
+            listas = [array("I") for _ in ids]
+            for nome, amigos in rede.items():
+                uid = ids[nome]
+                for amigo in amigos:
+                    if amigo != nome:
+                        listas[uid].append(ids[amigo])
+                        listas[ids[amigo]].append(uid)
+            self._carregar(list(ids), listas)
+
+    @classmethod
+    def de_listas(cls, nomes, listas):
+        """Monta o grafo de `nomes[i]` -> `listas[i]` (arrays de ids ja
+        simetricos, podendo ter repeticoes), sem passar por dicts de sets."""
+        grafo = cls()
+        grafo._carregar(nomes, listas)
+        return grafo
+
+    @classmethod
+    def de_csr(cls, nomes, usuarios, indptr, indices):
+        """Usa o CSR do snapshot (simetrico, listas ordenadas e sem
+        repeticao, nomes em ordem alfabetica) como esta, sem copiar a
+        adjacencia. Nomes sem marca em `usuarios` e sem amigos ficam livres."""
+        grafo = cls()
+        chaves = grafo._nomes_de(nomes)
+        grafo._indptr, grafo._indices = indptr, indices
+        grafo._entradas = len(indices)
+        # quase todos os nomes sao usuarios: procura so os sem marca
+        presentes = array("I")
+        marcas = bytes(usuarios)
+        anterior = 0
+        uid = marcas.find(0)
+        while uid != -1:
+            if indptr[uid] == indptr[uid + 1]:
+                presentes.extend(range(anterior, uid))
+                anterior = uid + 1
+                grafo._esquecer_nome(uid)
+            uid = marcas.find(0, uid + 1)
+        presentes.extend(range(anterior, len(nomes)))
+        if len(presentes) < len(chaves):
+            chaves = [chaves[uid] for uid in presentes]
+        grafo._encher_tabela(presentes, chaves)
+        grafo._ordenados = ListaOrdenada.de_ordenados(presentes, chave=grafo._nome, tipo="I")
+        return grafo
+
+    def para_csr(self):
+        """O inverso de `de_csr`, com os ids na ordem alfabetica dos nomes.
+        Se os ids ja estao nessa ordem (como depois de `de_csr`, sem usuarios
+        novos), o CSR sai como esta, sem remapear."""
+        if self._buffer:
+            self._consolidar()
+        ordem = array("I", self._ordenados)
+        nomes = list(map(self._nome, ordem))
+        usuarios = b"\1" * len(ordem)
+        indptr, indices = self._indptr, self._indices
+        if len(ordem) == len(self._inicio) and ordem == array("I", range(len(ordem))):
+            return nomes, usuarios, indptr, indices
+        posicao = array("I", bytes(4 * len(self._inicio)))
+        for i, uid in enumerate(ordem):
+            posicao[uid] = i
+        novo_indptr = array("q", [0])
+        novo_indices = array("I")
+        for uid in ordem:
+            novo_indices.extend(sorted(map(posicao.__getitem__, indices[indptr[uid]:indptr[uid + 1]])))
+            novo_indptr.append(len(novo_indices))
+        return nomes, usuarios, novo_indptr, novo_indices
+
+    # ----------------------------------------------------- armazenamento
+
+    def _carregar(self, nomes, listas):
+        self._encher_tabela(range(len(nomes)), self._nomes_de(nomes))
+        indptr = array("q", [0])
+        indices = array("I")
+        for lista in listas:
+            indices.extend(sorted(set(lista)))
+            indptr.append(len(indices))
+        self._indptr, self._indices = memoryview(indptr), memoryview(indices)
+        self._entradas = len(indices)
+        self._ordenados = ListaOrdenada(range(len(nomes)), chave=self._nome, tipo="I")
+
+    def _nomes_de(self, nomes):
+        """Monta `_texto` e `_inicio` de `nomes` (lista sem repeticao) e
+        devolve os nomes em utf-8."""
+        texto = "\n".join(nomes).encode("utf-8") + b"\n" if nomes else b""
+        chaves = texto.split(b"\n")[:-1]
+        if len(chaves) != len(nomes):
+            raise ErroGrafo("O nome nao pode ter quebra de linha")
+        self._texto = bytearray(texto)
+        # cada nome comeca um byte ("\n") depois do fim do anterior
+        self._inicio = array("Q", accumulate(map((1).__add__, map(len, chaves)), initial=0))
+        self._inicio.pop()
+        return chaves
+
+    def _nome(self, uid):
+        texto, inicio = self._texto, self._inicio[uid]
+        return texto[inicio:texto.index(10, inicio)].decode("utf-8")
+
+    def _procurar(self, chave):
+        """Posicao de `chave` (nome em utf-8) na tabela e o id dele, ou a
+        primeira posicao livre para ela e None."""
+        tabela, inicio, texto = self._tabela, self._inicio, self._texto
+        mascara = len(tabela) - 1
+        i = hash(chave) & mascara
+        livre = None
+        while True:
+            valor = tabela[i]
+            if valor == 0:
+                return (i if livre is None else livre), None
+            if valor == REMOVIDO:
+                if livre is None:
+                    livre = i
+            else:
+                comeco = inicio[valor - 1]
+                if texto.startswith(chave, comeco) and texto[comeco + len(chave)] == 10:
+                    return i, valor - 1
+            i = (i + 1) & mascara
+
+    def _id(self, nome):
+        if not isinstance(nome, str):
+            return None
+        return self._procurar(nome.encode("utf-8"))[1]
+
+    def _encher_tabela(self, uids, chaves):
+        """Tabela nova so com `uids` (de nomes `chaves` em utf-8, sem
+        repeticao, entao nao precisa comparar nomes), metade ou menos cheia."""
+        tamanho = 8
+        while tamanho <= 2 * len(uids):
+            tamanho *= 2
+        tabela = array("I", bytes(4 * tamanho))
+        mascara = tamanho - 1
+        for uid, h in zip(uids, map(hash, chaves)):
+            i = h & mascara
+            while tabela[i]:
+                i = (i + 1) & mascara
+            tabela[i] = uid + 1
+        self._tabela = tabela
+        self._ocupados = len(uids)
+
+    def _refazer_tabela(self):
+        """Tabela nova sem as marcas de removido."""
+        texto = self._texto
+        vivos = [uid for uid, comeco in enumerate(self._inicio) if comeco != AUSENTE]
+        chaves = [bytes(texto[comeco:texto.index(10, comeco)])
+                  for comeco in map(self._inicio.__getitem__, vivos)]
+        self._encher_tabela(vivos, chaves)
+
+    def _esquecer_nome(self, uid):
+        # so o texto e o inicio; a tabela fica por conta de quem chama
+        comeco = self._inicio[uid]
+        self._lixo += self._texto.index(10, comeco) + 1 - comeco
+        self._inicio[uid] = AUSENTE
+        self._livres.append(uid)
+
+    def _internar(self, nome):
+        chave = nome.encode("utf-8")
+        posicao, uid = self._procurar(chave)
+        if uid is not None:
+            return uid
+        if b"\n" in chave:
+            raise ErroGrafo("O nome nao pode ter quebra de linha")
+        if self._livres:
+            uid = self._livres.pop()
+            self._inicio[uid] = len(self._texto)
+        else:
+            uid = len(self._inicio)
+            self._inicio.append(len(self._texto))
+        self._texto += chave
+        self._texto.append(10)
+        if self._tabela[posicao] == 0:
+            self._ocupados += 1
+        self._tabela[posicao] = uid + 1
+        if 2 * self._ocupados > len(self._tabela):
+            self._refazer_tabela()
+        return uid
+
+    def _remover_nome(self, uid):
+        posicao, _ = self._procurar(self._nome(uid).encode("utf-8"))
+        self._tabela[posicao] = REMOVIDO
+        self._esquecer_nome(uid)
+        if 2 * self._lixo > len(self._texto) > BUFFER_MINIMO:
+            self._compactar_texto()
+
+    def _compactar_texto(self):
+        texto, inicio = self._texto, self._inicio
+        novo = bytearray()
+        for uid, comeco in enumerate(inicio):
+            if comeco != AUSENTE:
+                inicio[uid] = len(novo)
+                novo += texto[comeco:texto.index(10, comeco) + 1]
+        self._texto = novo
+        self._lixo = 0
+
+    def _linha(self, uid):
+        """Ids dos amigos de `uid`, do buffer ou do CSR."""
+        linha = self._buffer.get(uid)
+        if linha is not None:
+            return linha
+        indptr = self._indptr
+        if uid + 1 < len(indptr):
+            return self._indices[indptr[uid]:indptr[uid + 1]]
+        return ()
+
+    def _linha_mutavel(self, uid):
+        linha = self._buffer.get(uid)
+        if linha is None:
+            linha = self._buffer[uid] = _copia(self._linha(uid))
+            self._no_buffer += len(linha)
+        return linha
+
+    def _sao_amigos(self, uid, amigo):
+        atuais = self._linha(uid)
+        i = bisect_left(atuais, amigo)
+        return i < len(atuais) and atuais[i] == amigo
+
+    def _inserir(self, uid, amigo):
+        atuais = self._linha_mutavel(uid)
+        i = bisect_left(atuais, amigo)
+        if i == len(atuais) or atuais[i] != amigo:
+            atuais.insert(i, amigo)
+            self._no_buffer += 1
+            self._entradas += 1
+
+    def _retirar(self, uid, amigo):
+        self._linha_mutavel(uid).remove(amigo)
+        self._no_buffer -= 1
+        self._entradas -= 1
+
+    def _consolidar_se_cheio(self):
+        if self._no_buffer > max(BUFFER_MINIMO, len(self._indices) // 8):
+            self._consolidar()
+
+    def _consolidar(self):
+        """Junta o buffer de escrita ao CSR num CSR novo; as faixas de ids
+        sem mudanca sao copiadas em bloco."""
+        buffer = self._buffer
+        indptr = array("q", [0])
+        indices = array("I")
+        anterior = 0
+        for uid in sorted(buffer):
+            self._copiar_base(indptr, indices, anterior, uid)
+            indices.extend(buffer[uid])
+            indptr.append(len(indices))
+            anterior = uid + 1
+        self._copiar_base(indptr, indices, anterior, len(self._inicio))
+        self._indptr, self._indices = memoryview(indptr), memoryview(indices)
+        self._buffer = {}
+        self._no_buffer = 0
+
+    def _copiar_base(self, indptr, indices, inicio, fim):
+        base = self._indptr
+        fim_base = max(inicio, min(fim, len(base) - 1))
+        if inicio < fim_base:
+            deslocamento = len(indices) - base[inicio]
+            indices.frombytes(self._indices[base[inicio]:base[fim_base]].cast("B"))
+            indptr.extend(p + deslocamento for p in base[inicio + 1:fim_base + 1])
+        # ids criados depois do CSR, sem amigos
+        indptr.extend(repeat(len(indices), fim - fim_base))
+
+    # ------------------------------------------------------ Mapping
+
+    def __getitem__(self, nome):
+        uid = self._id(nome)
+        if uid is None:
+            raise KeyError(nome)
+        return AmigosCompactos(self, uid)
+
+    def __iter__(self):
+        return map(self._nome, self._ordenados)
+
+    def __len__(self):
+        return len(self._ordenados)
+
+    def __contains__(self, nome):
+        return self._id(nome) is not None
+
+    def total_amizades(self):
+        return self._entradas // 2
+
+    def _validar(self, *nomes):
+        """Os ids de `nomes`, que precisam existir."""
+        ids = []
+        for nome in nomes:
+            uid = self._id(nome)
+            if uid is None:
+                raise ErroGrafo(f"Usuario {nome} nao existe")
+            ids.append(uid)
+        return ids
+
+    def usuarios_ordenados(self, prefixo="", depois=None):
+        if depois is None or depois < prefixo:
+            uids = self._ordenados.a_partir_de(prefixo)
+        else:
+            uids = self._ordenados.a_partir_de(depois, inclusivo=False)
+        for nome in map(self._nome, uids):
+            if not nome.startswith(prefixo):
+                return
+            yield nome
+
+    # ------------------------------------------------------- mudancas
+
+    def adicionar_usuario(self, nome):
+        if nome in self:
+            return False
+        self._ordenados.adicionar(self._internar(nome))
+        self._notificar("usuario_adicionado", nome)
+        self._concluir()
+        return True
+
+    def remover_usuario(self, nome):
+        uid, = self._validar(nome)
+        amigos_ids = _copia(self._linha(uid))
+        amigos = set(map(self._nome, amigos_ids))
+        for amigo in amigos_ids:
+            self._retirar(amigo, uid)
+        self._no_buffer -= len(self._buffer.get(uid, ()))
+        self._buffer[uid] = array("I")
+        self._entradas -= len(amigos_ids)
+        # a lista ordenada compara pelo nome: sai antes de o nome sumir
+        self._ordenados.remover(uid)
+        self._remover_nome(uid)
+        self._consolidar_se_cheio()
+        self._notificar("usuario_removido", nome, amigos)
+        self._concluir()
+        return amigos
+
+    def adicionar_amizade(self, usuario, amigo):
+        uid, aid = self._validar(usuario, amigo)
+        if usuario == amigo:
+            raise ErroGrafo("Um usuario nao pode ser amigo de si mesmo")
+        if self._sao_amigos(uid, aid):
+            return False
+        for origem, destino, a, b in ((usuario, amigo, uid, aid), (amigo, usuario, aid, uid)):
+            self._inserir(a, b)
+            self._notificar("aresta_adicionada", origem, destino)
+        self._consolidar_se_cheio()
+        self._concluir()
+        return True
+
+    def remover_amizade(self, usuario, amigo):
+        uid, aid = self._validar(usuario, amigo)
+        if not self._sao_amigos(uid, aid):
+            return False
+        for origem, destino, a, b in ((usuario, amigo, uid, aid), (amigo, usuario, aid, uid)):
+            self._retirar(a, b)
+            self._notificar("aresta_removida", origem, destino)
+        self._consolidar_se_cheio()
+        self._concluir()
+        return True
+
+    # --------------------------------------------------- recomendacao
+
+    def recomendar(self, usuario, minimo=MINIMO_EM_COMUM):
+        """Mesma regra de `recomendacao`, contando ids em vez de nomes."""
+        uid = self._id(usuario)
+        if uid is None:
+            raise KeyError(usuario)
+        amigos = self._linha(uid)
+        contagem = Counter()
+        for amigo in amigos:
+            contagem.update(self._linha(amigo))
+        contagem.pop(uid, None)
+        for amigo in amigos:
+            contagem.pop(amigo, None)
+        return sorted(self._nome(c) for c, qtd in contagem.items() if qtd >= minimo)
+
+    # -------------------------------------------------------- memoria
+
+    def bytes_memoria(self):
+        """Mesma conta do `Grafo`: listas de amigos (CSR e buffer), a tabela
+        de simbolos (texto, inicios e tabela hash) e a lista ordenada. O CSR
+        conta pelo tamanho dos dados, esteja na memoria ou mapeado."""
+        total = (sys.getsizeof(self._texto) + sys.getsizeof(self._inicio)
+                 + sys.getsizeof(self._tabela) + sys.getsizeof(self._livres)
+                 + self._ordenados.bytes_listas()
+                 + self._indptr.nbytes + self._indices.nbytes
+                 + sys.getsizeof(self._buffer))
+        return total + sum(sys.getsizeof(linha) for linha in self._buffer.values())
@@ -0,0 +1,270 @@
+"""Importacao e exportacao da rede em lote.
+
+Formatos (escolhidos pela extensao, ou por `formato=`):
+
+    csv       uma amizade por linha: `usuario,amigo` (cabecalho opcional)
+    arestas   uma amizade por linha separada por espacos; `#` comenta
+    binario   cabecalho `ARES`, versao, n_nomes, n_arestas, bytes_nomes;
+              nomes utf-8 separados por "\\n"; pares uint32 (origem, destino)
+
+A leitura e feita em blocos de `TAMANHO_BLOCO` linhas/pares. Cada nome
+vira um id na primeira vez que aparece e cada amizade e guardada nos dois
+sentidos num `array("I")` por usuario. As repeticoes sao tiradas durante a
+leitura: quando o total guardado dobra desde a ultima limpeza, as listas
+que dobraram de tamanho sao ordenadas sem repeticoes, entao a memoria
+acompanha as amizades distintas e nao as linhas do arquivo. O resultado sai direto no formato do `GrafoCompacto`,
+sem um `set` de `str` por usuario no meio do caminho.
+
+Pela linha de comando a importacao junta as amizades do arquivo com a rede
+salva em `dados/`; `--substituir` troca a rede salva pela do arquivo.
+
+    python importacao.py importar amizades.csv --dados dados
+    python importacao.py importar amizades.csv --dados dados --substituir
+    python importacao.py exportar amizades.bin --dados dados
+"""
+
+import argparse
+import csv
+import os
+import struct
+import sys
+from array import array
+from itertools import islice
+
+from grafo_compacto import GrafoCompacto
+
+MAGICO = b"ARES"
+VERSAO = 1
+CABECALHO = struct.Struct("<4sIQQQ")
+TAMANHO_BLOCO = 1 << 16
+# listas menores que isso nao valem uma limpeza no meio da leitura
+MINIMO_LIMPEZA = 64
+
+EXTENSOES = {
+    ".csv": "csv",
+    ".txt": "arestas",
+    ".edges": "arestas",
+    ".bin": "binario",
+}
+
+
+def detectar_formato(caminho):
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao not in EXTENSOES:
+        raise ValueError(f"Formato desconhecido para {caminho}; use formato=")
+    return EXTENSOES[extensao]
+
+
+# ---------------------------------------------------------------- leitura
+
+def _pares_csv(arquivo):
+    leitor = csv.reader(arquivo)
+    primeira = next(leitor, None)
+    if primeira and len(primeira) >= 2 and primeira[:2] != ["usuario", "amigo"]:
+        yield primeira[0].strip(), primeira[1].strip()
+    for linha in leitor:
+        if len(linha) >= 2:
+            yield linha[0].strip(), linha[1].strip()
+
+
+def _pares_arestas(arquivo):
+    for linha in arquivo:
+        partes = linha.split("#", 1)[0].split()
+        if len(partes) >= 2:
+            yield partes[0], partes[1]
+
+
+class _Montagem:
+    def __init__(self):
+        self.nomes = []
+        self.ids = {}
+        self.listas = []
+        # tamanho a partir do qual cada lista e limpa de novo, e o mesmo
+        # para o total de ids guardados
+        self.limites = array("I")
+        self.guardados = 0
+        self.limite_guardados = MINIMO_LIMPEZA * TAMANHO_BLOCO
+
+    def juntar(self, rede):
+        """Comeca pelos usuarios e amizades de `rede` (ja simetrica)."""
+        for nome in rede:
+            self.internar(nome)
+        ids = self.ids
+        for nome, amigos in rede.items():
+            self.listas[ids[nome]].extend(map(ids.__getitem__, amigos))
+        self.guardados = sum(map(len, self.listas))
+
+    def internar(self, nome):
+        uid = self.ids.get(nome)
+        if uid is None:
+            uid = self.ids[nome] = len(self.nomes)
+            self.nomes.append(nome)
+            self.listas.append(array("I"))
+            self.limites.append(MINIMO_LIMPEZA)
+        return uid
+
+    def ligar_ids(self, origens, destinos):
+        listas = self.listas
+        for a, b in zip(origens, destinos):
+            if a != b:
+                listas[a].append(b)
+                listas[b].append(a)
+        self.guardados += 2 * len(origens)
+        if self.guardados > self.limite_guardados:
+            self._limpar()
+
+    def _limpar(self):
+        """Tira as repeticoes das listas que dobraram desde a ultima vez; os
+        limites dobram a cada limpeza, entao o custo por amizade e constante."""
+        listas, limites = self.listas, self.limites
+        guardados = 0
+        for uid, lista in enumerate(listas):
+            if len(lista) > limites[uid]:
+                lista = listas[uid] = array("I", sorted(set(lista)))
+                limites[uid] = max(MINIMO_LIMPEZA, 2 * len(lista))
+            guardados += len(lista)
+        self.guardados = guardados
+        self.limite_guardados = max(MINIMO_LIMPEZA * TAMANHO_BLOCO, 2 * guardados)
+
+    def ligar_nomes(self, pares):
+        internar = self.internar
+        origens = array("I")
+        destinos = array("I")
+        for a, b in pares:
+            origens.append(internar(a))
+            destinos.append(internar(b))
+        self.ligar_ids(origens, destinos)
+
+    def grafo(self, classe):
+        if classe is GrafoCompacto:
+            return GrafoCompacto.de_listas(self.nomes, self.listas)
+        nomes = self.nomes
+        return classe({nome: {nomes[j] for j in lista} for nome, lista in zip(nomes, self.listas)})
+
+
+def _ler_texto(montagem, pares, tamanho_bloco):
+    while bloco := list(islice(pares, tamanho_bloco)):
+        montagem.ligar_nomes(bloco)
+
+
+def _ler_binario(montagem, arquivo, tamanho_bloco):
+    magico, versao, n_nomes, n_arestas, bytes_nomes = CABECALHO.unpack(arquivo.read(CABECALHO.size))
+    if magico != MAGICO or versao != VERSAO:
+        raise ValueError("Arquivo binario de arestas invalido")
+    texto = arquivo.read(bytes_nomes).decode("utf-8")
+    # os ids do arquivo so valem dentro dele: com uma rede de base a
+    # montagem ja tem outros ids, entao cada par passa pelo mapa
+    mapa = array("I", (montagem.internar(nome) for nome in (texto.split("\n") if n_nomes else [])))
+
+    restantes = n_arestas
+    while restantes:
+        quantidade = min(restantes, tamanho_bloco)
+        pares = array("I")
+        pares.fromfile(arquivo, 2 * quantidade)
+        if sys.byteorder != "little":
+            pares.byteswap()
+        if pares and max(pares) >= n_nomes:
+            raise ValueError("Arquivo binario de arestas invalido: id fora da tabela de nomes")
+        pares = array("I", map(mapa.__getitem__, pares))
+        montagem.ligar_ids(pares[0::2], pares[1::2])
+        restantes -= quantidade
+
+
+def importar(caminho, formato=None, classe=GrafoCompacto, tamanho_bloco=TAMANHO_BLOCO,
+             base=None):
+    """Le o arquivo e devolve um grafo simetrico, sem amizades repetidas.
+    Com `base`, o grafo devolvido tem tambem os usuarios e amizades dela
+    (que nao e alterada)."""
+    formato = formato or detectar_formato(caminho)
+    montagem = _Montagem()
+    if base is not None:
+        montagem.juntar(base)
+    if formato == "binario":
+        with open(caminho, "rb") as arquivo:
+            _ler_binario(montagem, arquivo, tamanho_bloco)
+    else:
+        with open(caminho, encoding="utf-8", newline="") as arquivo:
+            pares = _pares_csv(arquivo) if formato == "csv" else _pares_arestas(arquivo)
+            _ler_texto(montagem, pares, tamanho_bloco)
+    return montagem.grafo(classe)
+
+
+# ---------------------------------------------------------------- escrita
+
+def _amizades(grafo):
+    """Cada amizade uma vez so, com o menor nome primeiro."""
+    for nome in grafo.usuarios_ordenados():
+        for amigo in grafo[nome]:
+            if nome < amigo:
+                yield nome, amigo
+
+
+def exportar(grafo, caminho, formato=None, tamanho_bloco=TAMANHO_BLOCO):
+    """Grava o grafo e retorna quantas amizades foram escritas."""
+    formato = formato or detectar_formato(caminho)
+    amizades = _amizades(grafo)
+    total = 0
+    if formato == "binario":
+        nomes = list(grafo.usuarios_ordenados())
+        ids = {nome: uid for uid, nome in enumerate(nomes)}
+        texto = "\n".join(nomes).encode("utf-8")
+        with open(caminho, "wb") as arquivo:
+            arquivo.write(CABECALHO.pack(MAGICO, VERSAO, len(nomes), grafo.total_amizades(), len(texto)))
+            arquivo.write(texto)
+            while bloco := list(islice(amizades, tamanho_bloco)):
+                pares = array("I")
+                for a, b in bloco:
+                    pares.append(ids[a])
+                    pares.append(ids[b])
+                if sys.byteorder != "little":
+                    pares.byteswap()
+                pares.tofile(arquivo)
+                total += len(bloco)
+        return total
+
+    with open(caminho, "w", encoding="utf-8", newline="") as arquivo:
+        if formato == "csv":
+            escritor = csv.writer(arquivo)
+            escritor.writerow(["usuario", "amigo"])
+            while bloco := list(islice(amizades, tamanho_bloco)):
+                escritor.writerows(bloco)
+                total += len(bloco)
+        else:
+            while bloco := list(islice(amizades, tamanho_bloco)):
+                arquivo.write("".join(f"{a} {b}\n" for a, b in bloco))
+                total += len(bloco)
+    return total
+
+
+def main():
+    from RedeSocial import DIRETORIO_DADOS
+    from armazenamento import ArmazenamentoRede
+
+    parser = argparse.ArgumentParser(description="Importa/exporta amizades em lote")
+    parser.add_argument("acao", choices=["importar", "exportar"])
+    parser.add_argument("arquivo")
+    parser.add_argument("--formato", choices=sorted(set(EXTENSOES.values())))
+    parser.add_argument("--dados", default=DIRETORIO_DADOS)
+    parser.add_argument("--substituir", action="store_true",
+                        help="troca a rede salva pela do arquivo em vez de juntar as duas")
+    args = parser.parse_args()
+
+    armazenamento = ArmazenamentoRede(args.dados)
+    if args.acao == "importar":
+        salva = armazenamento.carregar(classe=GrafoCompacto)
+        antes = salva.total_amizades()
+        base = None if args.substituir else salva
+        armazenamento.rede = importar(args.arquivo, args.formato, base=base)
+        armazenamento.compactar()
+        substituidas = ", substituidas pelo arquivo" if args.substituir else ""
+        print(f"{len(armazenamento.rede)} usuarios e "
+              f"{armazenamento.rede.total_amizades()} amizades na rede "
+              f"(eram {antes} amizades{substituidas})")
+    else:
+        total = exportar(armazenamento.carregar(classe=GrafoCompacto), args.arquivo, args.formato)
+        print(f"{total} amizades exportadas")
+    armazenamento.fechar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Indice materializado de amigos em comum.
+
+Guarda, para cada par (usuario, candidato), quantos amigos do usuario tem o
+candidato como amigo - o mesmo `contador` que `recomendacao` monta a cada
+chamada. O contador de um usuario e montado na primeira consulta e dai em diante
+atualizado a cada mudanca de aresta em O(grau), entao uma recomendacao vira
+uma consulta mais o filtro de minimo. Montar todos de uma vez, na
+inicializacao, custava mais que carregar a rede.
+
+Para manter os contadores ele precisa saber quem tem cada usuario como
+amigo (`entrada`). Num dict qualquer isso e montado na inicializacao; no
+`Grafo`, que e simetrico, sao os proprios amigos do usuario, entao a rede
+e consultada direto, sem copia.
+
+Ele e um observador do `Grafo`, que chama `aresta_adicionada`,
+`aresta_removida`, `usuario_adicionado` e `usuario_removido` depois de
+cada mudanca.
+"""
+
+from collections import Counter
+
+from grafo import Grafo
+from ranking import top_k
+
+MINIMO_EM_COMUM = 2
+
+
+class IndiceAmigosEmComum:
+    def __init__(self, rede, minimo=MINIMO_EM_COMUM):
+        self.rede = rede
+        self.minimo = minimo
+        self.comum = {}
+        # None: a rede e simetrica e serve de entrada (ver `_seguidores`)
+        self.entrada = None
+
+        if not isinstance(rede, Grafo):
+            self.entrada = {}
+            for usuario, amigos in rede.items():
+                for amigo in amigos:
+                    self.entrada.setdefault(amigo, set()).add(usuario)
+
+    def _seguidores(self, origem, destino):
+        """Quem tem `origem` como amigo durante o evento (origem, destino).
+        No grafo simetrico sao os amigos de `origem`, menos no par que esta
+        mudando: a amizade e avisada um sentido por vez, entao `destino` e
+        conferido direto."""
+        if self.entrada is not None:
+            return self.entrada.get(origem, ())
+        seguidores = [p for p in self.rede.get(origem, ()) if p != destino]
+        if origem in self.rede.get(destino, ()):
+            seguidores.append(destino)
+        return seguidores
+
+    def _somar(self, usuario, candidato, delta):
+        contagem = self.comum.get(usuario)
+        if contagem is None:
+            # ainda nao montado: a primeira consulta ja vera a mudanca
+            return
+        qtd = contagem.get(candidato, 0) + delta
+        if qtd > 0:
+            contagem[candidato] = qtd
+        else:
+            contagem.pop(candidato, None)
+
+    def _mudar_aresta(self, origem, destino, delta):
+        # caminhos p -> origem -> destino
+        for p in self._seguidores(origem, destino):
+            self._somar(p, destino, delta)
+        # caminhos origem -> destino -> x
+        for x in self.rede.get(destino, ()):
+            self._somar(origem, x, delta)
+
+    def aresta_adicionada(self, origem, destino):
+        if self.entrada is not None:
+            self.entrada.setdefault(destino, set()).add(origem)
+        self._mudar_aresta(origem, destino, 1)
+
+    def aresta_removida(self, origem, destino):
+        self._mudar_aresta(origem, destino, -1)
+        if self.entrada is None:
+            return
+        seguidores = self.entrada.get(destino)
+        if seguidores is not None:
+            seguidores.discard(origem)
+            if not seguidores:
+                del self.entrada[destino]
+
+    def usuario_adicionado(self, nome):
+        pass
+
+    def usuario_removido(self, nome, amigos):
+        if self.entrada is None:
+            # no grafo simetrico quem tinha `nome` como amigo eram os amigos dele
+            seguidores = amigos
+        else:
+            seguidores = self.entrada.pop(nome, set())
+        for destino in amigos:
+            for p in seguidores:
+                self._somar(p, destino, -1)
+            if self.entrada is None:
+                continue
+            restantes = self.entrada.get(destino)
+            if restantes is not None:
+                restantes.discard(nome)
+                if not restantes:
+                    del self.entrada[destino]
+
+        self.comum.pop(nome, None)
+        for p in seguidores:
+            for q in self._seguidores(p, nome):
+                contagem = self.comum.get(q)
+                if contagem is not None:
+                    contagem.pop(nome, None)
+
+    def contagem(self, usuario):
+        contagem = self.comum.get(usuario)
+        if contagem is None:
+            if usuario not in self.rede:
+                return {}
+            contador = Counter()
+            for amigo in self.rede[usuario]:
+                contador.update(self.rede.get(amigo, ()))
+            contagem = self.comum[usuario] = dict(contador)
+        return contagem
+
+    def recomendar(self, usuario):
+        amigos = self.rede.get(usuario, ())
+        return sorted(
+            candidato for candidato, qtd in self.contagem(usuario).items()
+            if qtd >= self.minimo and candidato != usuario and candidato not in amigos
+        )
+
+    def ranking(self, usuario, k=10, cursor=None):
+        """Top-k por amigos em comum (desempate alfabetico), paginado."""
+        excluidos = set(self.rede.get(usuario, ()))
+        excluidos.add(usuario)
+        return top_k(self.contagem(usuario), k, excluidos, self.minimo, cursor)
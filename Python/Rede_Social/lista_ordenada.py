@@ -0,0 +1,111 @@
+"""Lista ordenada em blocos, para manter os nomes da rede sempre em ordem.
+
+Os itens ficam em blocos ordenados de ate `2 * CARGA` itens, mais a lista
+com o maior item de cada bloco. Inserir ou remover mexe so em um bloco
+(O(log n + CARGA)), em vez de deslocar a lista inteira, e percorrer a
+partir de um item comeca com duas buscas binarias.
+
+Com `chave` os itens sao ordenados por `chave(item)` (e `a_partir_de`
+recebe uma chave); com `tipo` os blocos sao `array(tipo)` em vez de
+listas, para guardar ids sem um objeto por item.
+"""
+
+import sys
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+CARGA = 1000
+
+
+class ListaOrdenada:
+    def __init__(self, itens=(), chave=None, tipo=None):
+        self._chave = chave
+        self._tipo = tipo
+        self._montar(sorted(itens, key=chave))
+
+    @classmethod
+    def de_ordenados(cls, ordenados, chave=None, tipo=None):
+        """Monta a lista de itens que ja estao em ordem, sem ordenar de novo."""
+        lista = cls.__new__(cls)
+        lista._chave = chave
+        lista._tipo = tipo
+        lista._montar(ordenados)
+        return lista
+
+    def _novo(self, itens):
+        return list(itens) if self._tipo is None else array(self._tipo, itens)
+
+    def _montar(self, ordenados):
+        self._blocos = [self._novo(ordenados[i:i + CARGA]) for i in range(0, len(ordenados), CARGA)]
+        self._maximos = self._novo(bloco[-1] for bloco in self._blocos)
+        self._tamanho = len(ordenados)
+
+    def _de(self, valor):
+        return valor if self._chave is None else self._chave(valor)
+
+    def __len__(self):
+        return self._tamanho
+
+    def bytes_listas(self):
+        """Memoria das listas internas, sem contar os itens."""
+        return (sys.getsizeof(self._blocos) + sys.getsizeof(self._maximos)
+                + sum(sys.getsizeof(bloco) for bloco in self._blocos))
+
+    def __iter__(self):
+        for bloco in self._blocos:
+            yield from bloco
+
+    def __contains__(self, valor):
+        chave = self._chave
+        i = bisect_left(self._maximos, self._de(valor), key=chave)
+        if i == len(self._maximos):
+            return False
+        bloco = self._blocos[i]
+        return bloco[bisect_left(bloco, self._de(valor), key=chave)] == valor
+
+    def adicionar(self, valor):
+        if not self._blocos:
+            self._blocos.append(self._novo([valor]))
+            self._maximos.append(valor)
+            self._tamanho = 1
+            return
+
+        chave = self._chave
+        i = min(bisect_left(self._maximos, self._de(valor), key=chave), len(self._maximos) - 1)
+        bloco = self._blocos[i]
+        insort(bloco, valor, key=chave)
+        self._maximos[i] = bloco[-1]
+        self._tamanho += 1
+        if len(bloco) > 2 * CARGA:
+            self._blocos[i:i + 1] = [bloco[:CARGA], bloco[CARGA:]]
+            self._maximos[i:i + 1] = self._novo([bloco[CARGA - 1], bloco[-1]])
+
+    def remover(self, valor):
+        chave = self._chave
+        i = bisect_left(self._maximos, self._de(valor), key=chave)
+        if i == len(self._maximos):
+            raise ValueError(f"{valor!r} nao esta na lista")
+        bloco = self._blocos[i]
+        j = bisect_left(bloco, self._de(valor), key=chave)
+        if bloco[j] != valor:
+            raise ValueError(f"{valor!r} nao esta na lista")
+
+        del bloco[j]
+        self._tamanho -= 1
+        if bloco:
+            self._maximos[i] = bloco[-1]
+        else:
+            del self._blocos[i]
+            del self._maximos[i]
+
+    def a_partir_de(self, inicio, inclusivo=True):
+        """Itens >= `inicio` (ou > `inicio`, se nao `inclusivo`), em ordem;
+        com `chave`, `inicio` e comparado com a chave de cada item."""
+        busca = bisect_left if inclusivo else bisect_right
+        i = busca(self._maximos, inicio, key=self._chave)
+        if i == len(self._blocos):
+            return
+        bloco = self._blocos[i]
+        yield from bloco[busca(bloco, inicio, key=self._chave):]
+        for bloco in self._blocos[i + 1:]:
+            yield from bloco
@@ -0,0 +1,89 @@
+"""Geracao noturna de recomendacoes para todos os usuarios.
+
+A rede e convertida uma vez para CSR (ver `motor_recomendacao`) e os arrays
+`indptr`/`indices` sao copiados para memoria compartilhada. Cada processo do
+pool se conecta a esses blocos no inicializador, entao as tarefas levam so
+a faixa de ids da fatia, nunca a rede inteira. Os resultados sao gravados em
+JSON Lines conforme cada fatia termina.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+from motor_recomendacao import MINIMO_EM_COMUM, MotorRecomendacao
+
+TAMANHO_FATIA = 1000
+
+_motor = None
+_blocos = []
+
+
+def _compartilhar(vetor):
+    bloco = shared_memory.SharedMemory(create=True, size=max(1, len(vetor)) * vetor.itemsize)
+    bloco.buf[:len(vetor) * vetor.itemsize] = vetor.tobytes()
+    return bloco
+
+
+def _anexar(nome, tipo, tamanho):
+    bloco = shared_memory.SharedMemory(name=nome)
+    _blocos.append(bloco)
+    return bloco.buf.cast(tipo)[:tamanho]
+
+
+def _iniciar_processo(nomes, indptr, indices, minimo):
+    global _motor
+    _motor = MotorRecomendacao.de_csr(
+        nomes, _anexar(*indptr), _anexar(*indices), minimo
+    )
+
+
+def _recomendar_fatia(inicio, fim):
+    nomes = _motor.nomes
+    return [
+        (nomes[uid], [nomes[c] for c in _motor.recomendar_id(uid)])
+        for uid in range(inicio, fim)
+    ]
+
+
+def gerar_recomendacoes(rede, caminho_saida, processos=None,
+                        tamanho_fatia=TAMANHO_FATIA, minimo=MINIMO_EM_COMUM):
+    """Grava uma linha `{"usuario": ..., "recomendados": [...]}` por usuario
+    da rede e retorna quantas linhas foram escritas."""
+    motor = MotorRecomendacao(rede, minimo)
+    total = len(motor)
+    processos = processos or os.cpu_count() or 1
+
+    blocos = [_compartilhar(motor.indptr), _compartilhar(motor.indices)]
+    escritos = 0
+    try:
+        argumentos = (
+            motor.nomes,
+            (blocos[0].name, motor.indptr.typecode, len(motor.indptr)),
+            (blocos[1].name, motor.indices.typecode, len(motor.indices)),
+            minimo,
+        )
+        with ProcessPoolExecutor(processos, initializer=_iniciar_processo,
+                                 initargs=argumentos) as pool, \
+                open(caminho_saida, "w", encoding="utf-8") as saida:
+            tarefas = [
+                pool.submit(_recomendar_fatia, inicio, min(inicio + tamanho_fatia, total))
+                for inicio in range(0, total, tamanho_fatia)
+            ]
+            for tarefa in as_completed(tarefas):
+                for usuario, recomendados in tarefa.result():
+                    if usuario not in rede:
+                        continue
+                    saida.write(json.dumps(
+                        {"usuario": usuario, "recomendados": recomendados},
+                        ensure_ascii=False,
+                    ))
+                    saida.write("\n")
+                    escritos += 1
+                saida.flush()
+    finally:
+        for bloco in blocos:
+            bloco.close()
+            bloco.unlink()
+    return escritos
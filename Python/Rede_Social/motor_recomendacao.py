@@ -0,0 +1,127 @@
+"""Motor de recomendacao de amigos sobre adjacencia esparsa (CSR).
+
+Os nomes sao internados em ids inteiros na ordem alfabetica, entao ordenar
+ids e o mesmo que ordenar nomes. A adjacencia fica em dois arrays:
+
+    indptr[i] .. indptr[i + 1]  -> faixa de `indices` com os amigos do id i
+
+A contagem de amigos em comum e feita concatenando as faixas dos amigos do
+usuario (fatias copiadas em C com `frombytes`, que tambem aceita
+memoryviews de memoria compartilhada) e contando com `Counter`, sem
+laco Python por aresta.
+"""
+
+import heapq
+import math
+from array import array
+from collections import Counter
+from functools import cached_property
+
+from pontuacao import PONTUACOES
+
+MINIMO_EM_COMUM = 2
+
+
+class MotorRecomendacao:
+    def __init__(self, rede, minimo=MINIMO_EM_COMUM):
+        nomes = set(rede)
+        for amigos in rede.values():
+            nomes.update(amigos)
+
+        self.minimo = minimo
+        self.nomes = sorted(nomes)
+        self.ids = {nome: i for i, nome in enumerate(self.nomes)}
+        self.indptr = array("q", [0])
+        self.indices = array("l")
+        for nome in self.nomes:
+            self.indices.extend(sorted(self.ids[amigo] for amigo in rede.get(nome, ())))
+            self.indptr.append(len(self.indices))
+        self._preparar_visao()
+
+    @classmethod
+    def de_csr(cls, nomes, indptr, indices, minimo=MINIMO_EM_COMUM):
+        """Monta o motor direto de arrays CSR ja prontos (ou memoryviews de
+        memoria compartilhada), sem passar pelo dict da rede."""
+        motor = cls.__new__(cls)
+        motor.minimo = minimo
+        motor.nomes = nomes
+        motor.ids = {nome: i for i, nome in enumerate(nomes)}
+        motor.indptr = indptr
+        motor.indices = indices
+        motor._preparar_visao()
+        return motor
+
+    def _preparar_visao(self):
+        visao = memoryview(self.indices)
+        self._bruto = visao.cast("B")
+        self._tamanho = visao.itemsize
+        self._tipo = visao.format
+
+    def __len__(self):
+        return len(self.nomes)
+
+    @property
+    def total_arestas(self):
+        return len(self.indices)
+
+    def amigos_id(self, uid):
+        return self.indices[self.indptr[uid]:self.indptr[uid + 1]]
+
+    @cached_property
+    def graus(self):
+        indptr = self.indptr
+        return array("l", (indptr[i + 1] - indptr[i] for i in range(len(self.nomes))))
+
+    @cached_property
+    def inverso_grau(self):
+        """1 / grau, indexado pelo grau (nao pelo id)."""
+        return array("d", [0.0] + [1 / grau for grau in range(1, max(self.graus, default=0) + 1)])
+
+    @cached_property
+    def inverso_log_grau(self):
+        """1 / log(grau), indexado pelo grau; zero onde o log e zero."""
+        return array("d", [0.0, 0.0] + [1 / math.log(grau) for grau in range(2, max(self.graus, default=0) + 1)])
+
+    def vizinhanca(self, amigos):
+        """Concatena as listas de amigos de `amigos` num unico array."""
+        indptr, bruto, tamanho = self.indptr, self._bruto, self._tamanho
+        vizinhanca = array(self._tipo)
+        for amigo in amigos:
+            vizinhanca.frombytes(bruto[indptr[amigo] * tamanho:indptr[amigo + 1] * tamanho])
+        return vizinhanca
+
+    def contagem_id(self, uid):
+        """Conta, para cada candidato, quantos amigos de `uid` o tem como amigo."""
+        contagem = Counter(self.vizinhanca(self.amigos_id(uid)))
+
+        contagem.pop(uid, None)
+        for amigo in self.amigos_id(uid):
+            contagem.pop(amigo, None)
+        return contagem
+
+    def recomendar_id(self, uid):
+        return sorted(c for c, qtd in self.contagem_id(uid).items() if qtd >= self.minimo)
+
+    def contagem(self, usuario):
+        uid = self.ids[usuario]
+        return {self.nomes[c]: qtd for c, qtd in self.contagem_id(uid).items()}
+
+    def recomendar(self, usuario):
+        """Mesma regra de `recomendacao`: fora o proprio usuario e os amigos,
+        pelo menos `minimo` amigos em comum, em ordem alfabetica."""
+        return [self.nomes[c] for c in self.recomendar_id(self.ids[usuario])]
+
+    def recomendar_lote(self, usuarios=None):
+        if usuarios is None:
+            usuarios = self.nomes
+        return {usuario: self.recomendar(usuario) for usuario in usuarios}
+
+    def pontuar_id(self, uid, pontuacao="comuns"):
+        return PONTUACOES[pontuacao].pontuar(self, uid)
+
+    def ranking(self, usuario, k=10, pontuacao="comuns"):
+        """Os `k` melhores candidatos pela `pontuacao` escolhida, como
+        `(nome, nota)`, com desempate alfabetico."""
+        notas = self.pontuar_id(self.ids[usuario], pontuacao)
+        melhores = heapq.nsmallest(k, notas.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.nomes[c], nota) for c, nota in melhores]
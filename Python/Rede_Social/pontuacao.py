@@ -0,0 +1,99 @@
+"""Estrategias de pontuacao para recomendacao de amigos.
+
+Todas recebem o `MotorRecomendacao` e o id do usuario e devolvem
+`{candidato: nota}` so com candidatos que tem pelo menos `motor.minimo`
+amigos em comum:
+
+    comuns       numero de amigos em comum
+    jaccard      em comum / uniao das duas listas de amigos
+    adamic_adar  soma de 1 / log(grau) de cada amigo em comum
+    alocacao     soma de 1 / grau de cada amigo em comum
+
+Os pesos por grau vem das tabelas que o motor calcula uma vez. Para nao
+voltar a um laco Python por aresta, a vizinhanca do usuario e montada uma
+vez so: um `Counter` sobre ela da os amigos em comum, e um `filter` sobre
+os mesmos trechos (um por amigo, todos com o mesmo peso) so deixa chegar
+ao laco de soma os candidatos que passam do minimo.
+"""
+
+from abc import ABC, abstractmethod
+from collections import Counter
+
+
+class Pontuacao(ABC):
+    nome = None
+
+    @abstractmethod
+    def pontuar(self, motor, uid):
+        pass
+
+    @staticmethod
+    def _filtrar(motor, uid, contagem):
+        contagem.pop(uid, None)
+        for amigo in motor.amigos_id(uid):
+            contagem.pop(amigo, None)
+        return {c for c, qtd in contagem.items() if qtd >= motor.minimo}
+
+    @classmethod
+    def _somas_ponderadas(cls, motor, uid, pesos):
+        amigos = motor.amigos_id(uid)
+        vizinhanca = motor.vizinhanca(amigos)
+        aprovados = cls._filtrar(motor, uid, Counter(vizinhanca))
+        somas = dict.fromkeys(aprovados, 0.0)
+        if not aprovados:
+            return somas
+
+        # a vizinhanca e a concatenacao das listas dos amigos, na ordem
+        # deles: o trecho de cada amigo tem `grau` itens
+        aprovado = aprovados.__contains__
+        visao = memoryview(vizinhanca)
+        graus = motor.graus
+        inicio = 0
+        for amigo in amigos:
+            grau = graus[amigo]
+            peso = pesos[grau]
+            for candidato in filter(aprovado, visao[inicio:inicio + grau]):
+                somas[candidato] += peso
+            inicio += grau
+        return somas
+
+
+class VizinhosComuns(Pontuacao):
+    nome = "comuns"
+
+    def pontuar(self, motor, uid):
+        contagem = motor.contagem_id(uid)
+        return {c: contagem[c] for c in self._filtrar(motor, uid, contagem)}
+
+
+class Jaccard(Pontuacao):
+    nome = "jaccard"
+
+    def pontuar(self, motor, uid):
+        contagem = motor.contagem_id(uid)
+        graus = motor.graus
+        grau = graus[uid]
+        return {
+            c: contagem[c] / (grau + graus[c] - contagem[c])
+            for c in self._filtrar(motor, uid, contagem)
+        }
+
+
+class AdamicAdar(Pontuacao):
+    nome = "adamic_adar"
+
+    def pontuar(self, motor, uid):
+        return self._somas_ponderadas(motor, uid, motor.inverso_log_grau)
+
+
+class AlocacaoRecursos(Pontuacao):
+    nome = "alocacao"
+
+    def pontuar(self, motor, uid):
+        return self._somas_ponderadas(motor, uid, motor.inverso_grau)
+
+
+PONTUACOES = {
+    pontuacao.nome: pontuacao
+    for pontuacao in (VizinhosComuns(), Jaccard(), AdamicAdar(), AlocacaoRecursos())
+}
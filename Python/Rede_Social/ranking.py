@@ -0,0 +1,33 @@
+"""Top-k de recomendacoes por numero de amigos em comum.
+
+A ordem e (mais amigos em comum, nome). Em vez de ordenar todos os
+candidatos, `heapq.nsmallest` mantem um heap de no maximo `k` itens. O
+cursor de uma pagina e o ultimo item dela, `(qtd, nome)`; a pagina seguinte
+pega so os candidatos que vem depois dele, sobre as mesmas contagens.
+"""
+
+import heapq
+
+
+def _chave(item):
+    nome, qtd = item
+    return -qtd, nome
+
+
+def top_k(contagem, k, excluidos=(), minimo=1, cursor=None):
+    """Retorna `(pagina, proximo_cursor)`, com `pagina` uma lista de
+    `(nome, qtd)` e `proximo_cursor` None quando nao ha mais nada."""
+    candidatos = (
+        (nome, qtd) for nome, qtd in contagem.items()
+        if qtd >= minimo and nome not in excluidos
+    )
+    if cursor is not None:
+        limite = _chave((cursor[1], cursor[0]))
+        candidatos = (item for item in candidatos if _chave(item) > limite)
+
+    pagina = heapq.nsmallest(k + 1, candidatos, key=_chave)
+    if len(pagina) <= k:
+        return pagina, None
+    del pagina[k:]
+    nome, qtd = pagina[-1]
+    return pagina, (qtd, nome)
@@ -0,0 +1,134 @@
+"""Servico assincrono de leitura da rede em localhost.
+
+Protocolo: uma linha JSON por pedido e uma linha JSON por resposta, na
+mesma conexao, ate o cliente fechar.
+
+    {"acao": "amigos", "usuario": "Ana"}
+        -> {"ok": true, "amigos": [...]}
+    {"acao": "recomendacao", "usuario": "Ana"}
+        -> {"ok": true, "recomendados": [...]}
+
+Pedidos de recomendacao para o mesmo usuario que chegam enquanto um calculo
+ainda esta em andamento esperam esse mesmo calculo, em vez de disparar
+outro. O calculo roda num executor, fora do loop de eventos.
+
+    python servico.py --porta 8765
+"""
+
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from RedeSocial import DIRETORIO_DADOS, recomendar
+from armazenamento import ArmazenamentoRede
+from grafo_compacto import GrafoCompacto
+from indice_amigos import IndiceAmigosEmComum
+
+HOST = "127.0.0.1"
+PORTA = 8765
+LIMITE_LINHA = 64 * 1024
+
+
+class ServicoRede:
+    def __init__(self, rede, fonte=None, executor=None):
+        self.rede = rede
+        self.fonte = fonte
+        self.executor = executor or ThreadPoolExecutor()
+        self._em_andamento = {}
+        self.calculos = 0
+        self.coalescidos = 0
+
+    async def _coalescer(self, chave, funcao, *args):
+        futuro = self._em_andamento.get(chave)
+        if futuro is None:
+            futuro = asyncio.get_running_loop().run_in_executor(self.executor, funcao, *args)
+            self._em_andamento[chave] = futuro
+            futuro.add_done_callback(lambda _: self._em_andamento.pop(chave, None))
+            self.calculos += 1
+        else:
+            self.coalescidos += 1
+        # shield: um cliente que desiste nao cancela o calculo dos outros
+        return await asyncio.shield(futuro)
+
+    async def recomendacao(self, usuario):
+        return await self._coalescer(("recomendacao", usuario),
+                                     recomendar, self.rede, usuario, self.fonte)
+
+    def amigos(self, usuario):
+        return sorted(self.rede[usuario])
+
+    async def responder(self, pedido):
+        if not isinstance(pedido, dict):
+            return {"ok": False, "erro": "Pedido invalido"}
+        acao = pedido.get("acao")
+        usuario = pedido.get("usuario")
+        if not isinstance(usuario, str):
+            return {"ok": False, "erro": "Usuario invalido"}
+        if usuario not in self.rede:
+            return {"ok": False, "erro": f"Usuario {usuario} nao existe"}
+        if acao == "amigos":
+            return {"ok": True, "amigos": self.amigos(usuario)}
+        if acao == "recomendacao":
+            return {"ok": True, "recomendados": await self.recomendacao(usuario)}
+        return {"ok": False, "erro": f"Acao invalida: {acao}"}
+
+    @staticmethod
+    async def _enviar(escritor, resposta):
+        escritor.write(json.dumps(resposta, ensure_ascii=False).encode("utf-8") + b"\n")
+        await escritor.drain()
+
+    async def atender(self, leitor, escritor):
+        try:
+            while True:
+                try:
+                    linha = await leitor.readline()
+                except ValueError:
+                    # readline troca o LimitOverrunError por ValueError; o
+                    # resto da linha nao se separa do proximo pedido, entao
+                    # a conexao termina aqui
+                    await self._enviar(escritor, {"ok": False, "erro": "Pedido muito longo"})
+                    break
+                if not linha:
+                    break
+                try:
+                    resposta = await self.responder(json.loads(linha))
+                except ValueError:
+                    resposta = {"ok": False, "erro": "Pedido invalido"}
+                await self._enviar(escritor, resposta)
+        except ConnectionError:
+            pass
+        finally:
+            escritor.close()
+
+    async def iniciar(self, host=HOST, porta=PORTA):
+        return await asyncio.start_server(self.atender, host, porta,
+                                          limit=LIMITE_LINHA, backlog=4096)
+
+
+async def servir(servico, host=HOST, porta=PORTA):
+    servidor = await servico.iniciar(host, porta)
+    print(f"Servico da rede em {host}:{porta}")
+    async with servidor:
+        await servidor.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servico de leitura da rede social")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--porta", type=int, default=PORTA)
+    parser.add_argument("--dados", default=DIRETORIO_DADOS)
+    args = parser.parse_args()
+
+    armazenamento = ArmazenamentoRede(args.dados)
+    rede = armazenamento.carregar(classe=GrafoCompacto)
+    armazenamento.fechar()
+    servico = ServicoRede(rede, IndiceAmigosEmComum(rede))
+    try:
+        asyncio.run(servir(servico, args.host, args.porta))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
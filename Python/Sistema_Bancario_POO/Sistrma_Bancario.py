@@ -1,6 +1,19 @@
 from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Sequence
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
+from itertools import compress
+import math
+import os
+import sys
 import textwrap
+import threading
+
+from persistencia import LivroRazao
+
+DIRETORIO_DADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados")
 
 
 class Cliente:
@@ -23,13 +36,23 @@ class PessoaFisica(Cliente):
         self.cpf = cpf
 
 
+def valor_valido(valor):
+    # nan e inf passariam por `valor <= 0` e estragariam o saldo
+    return math.isfinite(valor) and valor > 0
+
+
 class Conta:
     def __init__(self, numero, cliente):
         self._numero = numero
         self._cliente = cliente
+        # em centavos inteiros, como no historico e no livro razao
         self._saldo = 0
         self._agencia = "0001"
         self._historico = Historico()
+        self.observadores = []
+        # conferir o saldo, mudar o saldo e gravar o historico acontecem
+        # com a trava da conta; contas diferentes nao disputam nada
+        self.trava = threading.RLock()
 
     @classmethod
     def nova_conta(cls, cliente, numero):
@@ -41,7 +64,7 @@ class Conta:
 
     @property
     def saldo(self):
-        return self._saldo
+        return self._saldo / 100
 
     @property
     def agencia(self):
@@ -55,54 +78,121 @@ class Conta:
     def historico(self):
         return self._historico
 
-    def sacar(self, valor):
-        if valor <= 0:
-            print("\nOperacao falhou, valor invalido")
-            return False
-
+    def _notificar(self, evento, *args):
+        for observador in self.observadores:
+            getattr(observador, evento)(*args)
+
+    def confirmar(self, transacao):
+        """Grava no historico uma transacao ja aplicada ao saldo e avisa os
+        observadores (o livro razao, por exemplo). Chamar com a trava."""
+        instante = self.historico.adicionar_transacao(transacao)
+        self._notificar("transacao_registrada", self, transacao, instante)
+
+    def efetivar(self, transacao):
+        """Aplica ao saldo e confirma uma transacao ja aceita por
+        `recusa_saque`/`recusa_deposito`. Chamar com a trava."""
+        self._saldo += transacao.efeito * transacao.centavos
+        self.confirmar(transacao)
+
+    def aplicar(self, tipo, centavos, efeito, instante):
+        """Refaz uma transacao vinda do log, sem aplicar regras de novo."""
+        with self.trava:
+            self._saldo += efeito * centavos
+            self.historico.restaurar(tipo, centavos, instante)
+
+    def recusa_saque(self, valor):
+        """Motivo para recusar o saque, ou None. Chamar com a trava."""
+        if not valor_valido(valor):
+            return "valor invalido"
         if valor > self.saldo:
-            print("\nOperacao falhou, saldo insuficiente")
-            return False
+            return "saldo insuficiente"
+        return None
 
-        self._saldo -= valor
+    def recusa_deposito(self, valor):
+        if not valor_valido(valor):
+            return "valor invalido"
+        return None
+
+    def sacar(self, valor):
+        centavos = para_centavos(valor)
+        valor = centavos / 100
+        with self.trava:
+            motivo = self.recusa_saque(valor)
+            if motivo:
+                print(f"\nOperacao falhou, {motivo}")
+                return False
+
+            self._saldo -= centavos
         print("\nSaque realizado com sucesso")
         return True
 
     def depositar(self, valor):
-        if valor <= 0:
-            print("\nOperacao falhou, valor invalido")
-            return False
-
-        self._saldo += valor
+        centavos = para_centavos(valor)
+        valor = centavos / 100
+        with self.trava:
+            motivo = self.recusa_deposito(valor)
+            if motivo:
+                print(f"\nOperacao falhou, {motivo}")
+                return False
+
+            self._saldo += centavos
         print("\nDeposito realizado com sucesso")
         return True
 
 
+class RegraSaque(ABC):
+    mensagem = "limite de saque excedido"
+
+    def __init__(self, maximo, janela="dia"):
+        self.maximo = maximo
+        self.janela = janela
+
+    @abstractmethod
+    def permite(self, historico, valor, quando):
+        pass
+
+
+class LimiteQuantidadeSaques(RegraSaque):
+    mensagem = "numero maximo de saques excedido"
+
+    def permite(self, historico, valor, quando):
+        quantidade, _ = historico.saques_na_janela(self.janela, quando)
+        return quantidade < self.maximo
+
+
+class LimiteValorSaques(RegraSaque):
+    mensagem = "valor maximo de saques no periodo excedido"
+
+    def permite(self, historico, valor, quando):
+        _, total = historico.saques_na_janela(self.janela, quando)
+        return total + valor <= self.maximo
+
+
 class ContaCorrente(Conta):
-    def __init__(self, numero, cliente, limite=500, limite_saques=3):
+    def __init__(self, numero, cliente, limite=500, limite_saques=3, regras_saque=None):
         super().__init__(numero, cliente)
         self.limite = limite
         self.limite_saques = limite_saques
+        self.regras_saque = [LimiteQuantidadeSaques(limite_saques, "dia")]
+        self.regras_saque.extend(regras_saque or [])
 
     @classmethod
     def nova_conta(cls, cliente, numero, limite=500, limite_saques=3):
         return cls(numero, cliente, limite, limite_saques)
 
-    def sacar(self, valor):
-        numero_saques = sum(
-            1 for transacao in self.historico.transacoes
-            if transacao["tipo"] == Saque.__name__
-        )
+    def recusa_saque(self, valor):
+        if not valor_valido(valor):
+            return "valor invalido"
 
         if valor > self.limite:
-            print("\nOperacao falhou, valor do saque excede o limite")
-            return False
+            return "valor do saque excede o limite"
 
-        if numero_saques >= self.limite_saques:
-            print("\nOperacao falhou, numero maximo de saques excedido")
-            return False
+        agora = datetime.now()
+        for regra in self.regras_saque:
+            if not regra.permite(self.historico, valor, agora):
+                return regra.mensagem
 
-        return super().sacar(valor)
+        return super().recusa_saque(valor)
 
     def __str__(self):
         return f"""\
@@ -112,29 +202,342 @@ Titular:\t{self.cliente.nome}
 """
 
 
+JANELAS_SAQUE = {
+    "dia": lambda quando: quando.date(),
+    "hora": lambda quando: (quando.date(), quando.hour),
+}
+
+
+class ContadorSaques:
+    def __init__(self, chave):
+        self._chave = chave
+        self._periodo = None
+        self.quantidade = 0
+        self.total = 0
+
+    def registrar(self, valor, quando):
+        periodo = self._chave(quando)
+        if periodo != self._periodo:
+            self._periodo = periodo
+            self.quantidade = 0
+            self.total = 0
+        self.quantidade += 1
+        self.total += valor
+
+    def consultar(self, quando):
+        if self._chave(quando) != self._periodo:
+            return 0, 0
+        return self.quantidade, self.total
+
+
+TAMANHO_BLOCO = 4096
+FORMATO_DATA = "%d-%m-%Y %H:%M:%S"
+# paginas alinhadas aos blocos comecam direto num ponto de controle
+TAMANHO_PAGINA_EXTRATO = TAMANHO_BLOCO
+FORMATOS_EXTRATO = ("texto", "csv")
+
+
+def para_centavos(valor):
+    # nan e inf nao tem centavos: viram 0, que `valor_valido` recusa
+    if not math.isfinite(valor):
+        return 0
+    return round(valor * 100)
+
+
+def _instante(quando):
+    if quando is None or isinstance(quando, (int, float)):
+        return quando
+    return quando.timestamp()
+
+
+def _totais(tipos, valores):
+    """{codigo: soma dos valores} de duas colunas alinhadas."""
+    return {codigo: sum(compress(valores, (t == codigo for t in tipos))) for codigo in set(tipos)}
+
+
+class BlocoTransacoes:
+    """Ate TAMANHO_BLOCO transacoes em colunas: codigo do tipo, valor em
+    centavos e data em segundos desde a epoca, mais o total por tipo e o
+    saldo (em centavos) antes da primeira transacao do bloco."""
+
+    def __init__(self, saldo_inicial=0):
+        self.tipos = array("B")
+        self.valores = array("q")
+        self.datas = array("d")
+        self.totais = {}
+        self.saldo_inicial = saldo_inicial
+
+    def __len__(self):
+        return len(self.tipos)
+
+    def adicionar(self, codigo, centavos, instante):
+        self.tipos.append(codigo)
+        self.valores.append(centavos)
+        self.datas.append(instante)
+        self.totais[codigo] = self.totais.get(codigo, 0) + centavos
+
+    def faixa(self, inicio, fim):
+        """Posicoes [primeira, ultima) com data em [inicio, fim)."""
+        primeira = 0 if inicio is None else bisect_left(self.datas, inicio)
+        ultima = len(self.datas) if fim is None else bisect_left(self.datas, fim)
+        return primeira, ultima
+
+
+class VisaoTransacoes(Sequence):
+    """Lista somente leitura no formato antigo ({"tipo", "valor", "data"}),
+    montando cada dict so quando ele e lido."""
+
+    def __init__(self, historico):
+        self._historico = historico
+
+    def __len__(self):
+        return len(self._historico)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(len(self)))]
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError(indice)
+        bloco = self._historico._blocos[indice // TAMANHO_BLOCO]
+        return self._historico._montar(bloco, indice % TAMANHO_BLOCO)
+
+    def __iter__(self):
+        for bloco in self._historico._blocos:
+            for posicao in range(len(bloco)):
+                yield self._historico._montar(bloco, posicao)
+
+
 class Historico:
+    """Historico em colunas, somente insercao, dividido em blocos de
+    tamanho fixo. As datas nunca decrescem, entao buscas por periodo sao
+    bisect em cada bloco."""
+
     def __init__(self):
-        self._transacoes = []
+        self._blocos = []
+        self._total = 0
+        self._codigos = {}
+        self._nomes = []
+        self._efeitos = []
+        self._saques = {nome: ContadorSaques(chave) for nome, chave in JANELAS_SAQUE.items()}
+
+    def __len__(self):
+        return self._total
 
     @property
     def transacoes(self):
-        return self._transacoes
+        return VisaoTransacoes(self)
+
+    def _codigo(self, tipo):
+        codigo = self._codigos.get(tipo)
+        if codigo is None:
+            codigo = self._codigos[tipo] = len(self._nomes)
+            self._nomes.append(tipo)
+            self._efeitos.append(EFEITOS.get(tipo, 0))
+        return codigo
+
+    def _variacao(self, totais):
+        """Efeito no saldo de um {codigo: total} (ver `_totais`)."""
+        return sum(self._efeitos[codigo] * centavos for codigo, centavos in totais.items())
+
+    def _montar(self, bloco, posicao):
+        return {
+            "tipo": self._nomes[bloco.tipos[posicao]],
+            "valor": bloco.valores[posicao] / 100,
+            "data": datetime.fromtimestamp(bloco.datas[posicao]).strftime(FORMATO_DATA),
+        }
+
+    def saques_na_janela(self, janela, quando=None):
+        return self._saques[janela].consultar(quando or datetime.now())
+
+    def adicionar_transacao(self, transacao, tipo=None):
+        """Anexa a transacao e retorna o instante gravado."""
+        agora = datetime.now()
+        instante = self._anexar(tipo or transacao.__class__.__name__,
+                                transacao.centavos, agora.timestamp())
+        if isinstance(transacao, Saque):
+            for contador in self._saques.values():
+                contador.registrar(transacao.valor, agora)
+        return instante
+
+    def restaurar(self, tipo, centavos, instante):
+        self._anexar(tipo, centavos, instante)
+        if tipo == Saque.__name__:
+            quando = datetime.fromtimestamp(instante)
+            for contador in self._saques.values():
+                contador.registrar(centavos / 100, quando)
+
+    def _anexar(self, tipo, centavos, instante):
+        if not self._blocos or len(self._blocos[-1]) >= TAMANHO_BLOCO:
+            self._blocos.append(BlocoTransacoes(self.saldo_final()))
+        bloco = self._blocos[-1]
+        # relogio voltando para tras nao pode quebrar a ordem das datas
+        if len(bloco):
+            instante = max(instante, bloco.datas[-1])
+        elif len(self._blocos) > 1:
+            instante = max(instante, self._blocos[-2].datas[-1])
+        bloco.adicionar(self._codigo(tipo), centavos, instante)
+        self._total += 1
+        return instante
+
+    def colunas(self, desde=0):
+        """(nomes dos tipos, tipos, valores em centavos, datas) a partir da
+        transacao `desde`; os blocos antes dela nem sao lidos."""
+        tipos, valores, datas = array("B"), array("q"), array("d")
+        resto = desde % TAMANHO_BLOCO
+        for bloco in self._blocos[desde // TAMANHO_BLOCO:]:
+            tipos.extend(bloco.tipos[resto:])
+            valores.extend(bloco.valores[resto:])
+            datas.extend(bloco.datas[resto:])
+            resto = 0
+        return list(self._nomes), tipos, valores, datas
 
-    def adicionar_transacao(self, transacao):
-        self._transacoes.append(
-            {
-                "tipo": transacao.__class__.__name__,
-                "valor": transacao.valor,
-                "data": datetime.now().strftime("%d-%m-%Y %H:%M:%S"),
-            }
-        )
+    @classmethod
+    def de_colunas(cls, nomes, tipos, valores, datas):
+        historico = cls()
+        for nome in nomes:
+            historico._codigo(nome)
+        for inicio in range(0, len(tipos), TAMANHO_BLOCO):
+            bloco = BlocoTransacoes(historico.saldo_final())
+            bloco.tipos = tipos[inicio:inicio + TAMANHO_BLOCO]
+            bloco.valores = valores[inicio:inicio + TAMANHO_BLOCO]
+            bloco.datas = datas[inicio:inicio + TAMANHO_BLOCO]
+            bloco.totais = _totais(bloco.tipos, bloco.valores)
+            historico._blocos.append(bloco)
+        historico._total = len(tipos)
+
+        # os contadores de saque so precisam do dia corrente
+        hoje = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        saque = historico._codigos.get(Saque.__name__)
+        for _, bloco, primeira, ultima in historico._faixas(hoje):
+            for posicao in range(primeira, ultima):
+                if bloco.tipos[posicao] == saque:
+                    quando = datetime.fromtimestamp(bloco.datas[posicao])
+                    for contador in historico._saques.values():
+                        contador.registrar(bloco.valores[posicao] / 100, quando)
+        return historico
+
+    def _faixas(self, inicio=None, fim=None):
+        """(indice do bloco, bloco, primeira, ultima) de cada bloco com
+        transacoes entre `inicio` (inclusivo) e `fim` (exclusivo)."""
+        inicio, fim = _instante(inicio), _instante(fim)
+        for indice, bloco in enumerate(self._blocos):
+            if inicio is not None and bloco.datas[-1] < inicio:
+                continue
+            if fim is not None and bloco.datas[0] >= fim:
+                break
+            primeira, ultima = bloco.faixa(inicio, fim)
+            if primeira < ultima:
+                yield indice, bloco, primeira, ultima
+
+    def entre(self, inicio=None, fim=None):
+        """Transacoes (no formato de `transacoes`) com data em [inicio, fim)."""
+        for _, bloco, primeira, ultima in self._faixas(inicio, fim):
+            for posicao in range(primeira, ultima):
+                yield self._montar(bloco, posicao)
+
+    def somar_por_tipo(self, inicio=None, fim=None):
+        """{tipo: total em centavos} no periodo; blocos inteiros usam o
+        total ja guardado."""
+        totais = {}
+        for _, bloco, primeira, ultima in self._faixas(inicio, fim):
+            if primeira == 0 and ultima == len(bloco):
+                parciais = bloco.totais
+            else:
+                parciais = _totais(bloco.tipos[primeira:ultima], bloco.valores[primeira:ultima])
+            for codigo, centavos in parciais.items():
+                tipo = self._nomes[codigo]
+                totais[tipo] = totais.get(tipo, 0) + centavos
+        return totais
+
+    def pagina(self, limite, cursor=None, inicio=None, fim=None):
+        """Retorna `(transacoes, proximo_cursor)`; o cursor e a posicao
+        global da proxima transacao e vale None na ultima pagina."""
+        resultado = []
+        proximo = None
+        cursor = cursor or 0
+        for indice, bloco, primeira, ultima in self._faixas(inicio, fim):
+            base = indice * TAMANHO_BLOCO
+            primeira = max(primeira, cursor - base)
+            for posicao in range(primeira, ultima):
+                if len(resultado) == limite:
+                    proximo = base + posicao
+                    break
+                resultado.append(self._montar(bloco, posicao))
+            if proximo is not None:
+                break
+        return resultado, proximo
+
+    # ------------------------------------------------------------ saldos
+
+    def saldo_final(self):
+        """Saldo em centavos depois da ultima transacao."""
+        if not self._blocos:
+            return 0
+        bloco = self._blocos[-1]
+        return bloco.saldo_inicial + self._variacao(bloco.totais)
+
+    def _saldo_antes(self, indice, posicao):
+        """Saldo em centavos antes da transacao `posicao` do bloco
+        `indice`: o ponto de controle do bloco mais o trecho anterior."""
+        bloco = self._blocos[indice]
+        if posicao == 0:
+            return bloco.saldo_inicial
+        if posicao >= len(bloco):
+            return bloco.saldo_inicial + self._variacao(bloco.totais)
+        return bloco.saldo_inicial + self._variacao(
+            _totais(bloco.tipos[:posicao], bloco.valores[:posicao]))
+
+    def saldo_em(self, quando):
+        """Saldo em centavos antes de `quando`."""
+        instante = _instante(quando)
+        for indice, bloco in enumerate(self._blocos):
+            if bloco.datas[-1] >= instante:
+                return self._saldo_antes(indice, bisect_left(bloco.datas, instante))
+        return self.saldo_final()
+
+    def pagina_extrato(self, limite, cursor=None, inicio=None, fim=None):
+        """Retorna `(linhas, saldo_anterior, proximo_cursor)`. Cada linha e
+        `(instante, tipo, centavos, saldo_depois)`; os saldos saem dos pontos
+        de controle dos blocos, sem somar o historico desde o comeco."""
+        linhas = []
+        saldo_anterior = None
+        proximo = None
+        cursor = cursor or 0
+        nomes, efeitos = self._nomes, self._efeitos
+        for indice, bloco, primeira, ultima in self._faixas(inicio, fim):
+            base = indice * TAMANHO_BLOCO
+            primeira = max(primeira, cursor - base)
+            if primeira >= ultima:
+                continue
+            saldo = self._saldo_antes(indice, primeira)
+            if saldo_anterior is None:
+                saldo_anterior = saldo
+            tipos, valores, datas = bloco.tipos, bloco.valores, bloco.datas
+            for posicao in range(primeira, ultima):
+                if len(linhas) == limite:
+                    proximo = base + posicao
+                    break
+                codigo = tipos[posicao]
+                saldo += efeitos[codigo] * valores[posicao]
+                linhas.append((datas[posicao], nomes[codigo], valores[posicao], saldo))
+            if proximo is not None:
+                break
+        if saldo_anterior is None:
+            saldo_anterior = self.saldo_final() if fim is None else self.saldo_em(fim)
+        return linhas, saldo_anterior, proximo
 
 
 class Transacao(ABC):
+    def __init__(self, valor):
+        # o valor vira centavos inteiros aqui, uma vez so: saldo, historico
+        # e livro razao usam o mesmo numero (10.004 vira 10.00)
+        self.centavos = para_centavos(valor)
+
     @property
-    @abstractmethod
     def valor(self):
-        pass
+        return self.centavos / 100
 
     @abstractmethod
     def registrar(self, conta):
@@ -142,29 +545,203 @@ class Transacao(ABC):
 
 
 class Saque(Transacao):
-    def __init__(self, valor):
-        self._valor = valor
-
-    @property
-    def valor(self):
-        return self._valor
+    efeito = -1
 
     def registrar(self, conta):
-        if conta.sacar(self.valor):
-            conta.historico.adicionar_transacao(self)
+        with conta.trava:
+            if conta.sacar(self.valor):
+                conta.confirmar(self)
 
 
 class Deposito(Transacao):
-    def __init__(self, valor):
-        self._valor = valor
+    efeito = 1
 
-    @property
-    def valor(self):
-        return self._valor
+    def registrar(self, conta):
+        with conta.trava:
+            if conta.depositar(self.valor):
+                conta.confirmar(self)
+
+
+@contextmanager
+def travar_em_ordem(contas):
+    """Trava as contas sempre em ordem crescente de numero: duas threads
+    que precisam das mesmas contas nunca esperam uma pela outra em ciclo."""
+    with ExitStack() as pilha:
+        for conta in sorted({id(conta): conta for conta in contas}.values(),
+                            key=lambda conta: conta.numero):
+            pilha.enter_context(conta.trava)
+        yield
+
+
+class Transferencia(Transacao):
+    """Debita a conta que registra e credita `destino` de uma vez so: as
+    duas travas sao tomadas juntas e o historico de cada conta ganha a sua
+    perna (`TransferenciaEnviada` / `TransferenciaRecebida`). Nao conta
+    como saque para os limites da `ContaCorrente`."""
+
+    ENVIADA = "TransferenciaEnviada"
+    RECEBIDA = "TransferenciaRecebida"
+
+    def __init__(self, valor, destino):
+        super().__init__(valor)
+        self.destino = destino
+
+    def _aplicar(self, origem):
+        """Chamar com as duas contas travadas; retorna o instante ou None."""
+        if not valor_valido(self.valor) or origem is self.destino:
+            return None
+        if self.valor > origem.saldo:
+            return None
+        origem._saldo -= self.centavos
+        self.destino._saldo += self.centavos
+        instante = origem.historico.adicionar_transacao(self, self.ENVIADA)
+        self.destino.historico.adicionar_transacao(self, self.RECEBIDA)
+        return instante
 
     def registrar(self, conta):
-        if conta.depositar(self.valor):
-            conta.historico.adicionar_transacao(self)
+        with travar_em_ordem((conta, self.destino)):
+            instante = self._aplicar(conta)
+            if instante is None:
+                print("\nOperacao falhou, transferencia invalida ou saldo insuficiente")
+                return False
+            conta._notificar("transferencias_registradas", [(conta, self, instante)])
+        print("\nTransferencia realizada com sucesso")
+        return True
+
+
+def transferir_em_lote(transferencias):
+    """Aplica `(origem, destino, valor)` em lote (uma folha de pagamento,
+    por exemplo): trava todas as contas envolvidas uma vez so, aplica cada
+    transferencia isoladamente e avisa os observadores com um evento por
+    lote. Retorna um bool por transferencia."""
+    itens = [(origem, Transferencia(valor, destino)) for origem, destino, valor in transferencias]
+    contas = [origem for origem, _ in itens] + [t.destino for _, t in itens]
+    resultados = []
+    with travar_em_ordem(contas):
+        confirmadas = {}
+        for origem, transferencia in itens:
+            instante = transferencia._aplicar(origem)
+            resultados.append(instante is not None)
+            if instante is not None:
+                # contas do mesmo cadastro dividem a lista de observadores
+                chave = id(origem.observadores)
+                confirmadas.setdefault(chave, (origem, []))[1].append(
+                    (origem, transferencia, instante))
+        for origem, lote in confirmadas.values():
+            origem._notificar("transferencias_registradas", lote)
+    return resultados
+
+
+# efeito de cada tipo do historico no saldo
+EFEITOS = {
+    Deposito.__name__: Deposito.efeito,
+    Saque.__name__: Saque.efeito,
+    Transferencia.ENVIADA: -1,
+    Transferencia.RECEBIDA: 1,
+}
+
+
+class Cadastro:
+    def __init__(self):
+        self._clientes_por_cpf = {}
+        self._contas_por_numero = {}
+        self._numeros_ordenados = []
+        self.observadores = []
+        self._trava = threading.RLock()
+
+    def _notificar(self, evento, *args):
+        for observador in self.observadores:
+            getattr(observador, evento)(*args)
+
+    @property
+    def clientes(self):
+        return list(self._clientes_por_cpf.values())
+
+    @property
+    def contas(self):
+        return [self._contas_por_numero[numero] for numero in self._numeros_ordenados]
+
+    def __len__(self):
+        return len(self._clientes_por_cpf)
+
+    @property
+    def total_contas(self):
+        return len(self._contas_por_numero)
+
+    def adicionar_cliente(self, cliente):
+        with self._trava:
+            if cliente.cpf in self._clientes_por_cpf:
+                return False
+            self._clientes_por_cpf[cliente.cpf] = cliente
+            self._notificar("cliente_adicionado", cliente)
+        return True
+
+    def buscar_cliente(self, cpf):
+        return self._clientes_por_cpf.get(cpf)
+
+    def adicionar_conta(self, conta):
+        with self._trava:
+            if conta.numero in self._contas_por_numero:
+                return False
+            self._contas_por_numero[conta.numero] = conta
+            insort(self._numeros_ordenados, conta.numero)
+            # a conta avisa os mesmos observadores do cadastro
+            conta.observadores = self.observadores
+            self._notificar("conta_adicionada", conta)
+        return True
+
+    @contextmanager
+    def travar_tudo(self):
+        """Congela o cadastro e todas as contas (travadas em ordem de
+        numero), para copiar um estado consistente."""
+        with self._trava, travar_em_ordem(self._contas_por_numero.values()):
+            yield self
+
+    def buscar_conta(self, numero):
+        return self._contas_por_numero.get(numero)
+
+    def proximo_numero(self):
+        return self._numeros_ordenados[-1] + 1 if self._numeros_ordenados else 1
+
+    def contas_entre(self, inicio, fim):
+        primeiro = bisect_left(self._numeros_ordenados, inicio)
+        ultimo = bisect_right(self._numeros_ordenados, fim)
+        return [self._contas_por_numero[numero] for numero in self._numeros_ordenados[primeiro:ultimo]]
+
+    # ------------------------------------------------- persistencia
+
+    def restaurar_cliente(self, cpf, nome, data_nascimento, endereco):
+        cliente = PessoaFisica(nome, data_nascimento, cpf, endereco)
+        self._clientes_por_cpf[cpf] = cliente
+        return cliente
+
+    def restaurar_conta(self, numero, cpf, limite, limite_saques, saldo_centavos=0, colunas=None):
+        cliente = self._clientes_por_cpf[cpf]
+        conta = ContaCorrente(numero, cliente, limite, limite_saques)
+        conta._saldo = saldo_centavos
+        if colunas is not None:
+            conta._historico = Historico.de_colunas(*colunas)
+        conta.observadores = self.observadores
+        self._contas_por_numero[numero] = conta
+        insort(self._numeros_ordenados, numero)
+        cliente.adicionar_conta(conta)
+        return conta
+
+    def estado(self, gravadas=None):
+        """Clientes e contas (com saldo em centavos e colunas do
+        historico) para o snapshot. Com `gravadas` ({numero: quantidade}),
+        as colunas de cada conta comecam depois das transacoes ja gravadas."""
+        gravadas = gravadas or {}
+        clientes = [
+            (c.cpf, c.nome, c.data_nascimento, c.endereco)
+            for c in self._clientes_por_cpf.values()
+        ]
+        contas = [
+            (c.numero, c.cliente.cpf, c.limite, c.limite_saques, c._saldo,
+             c.historico.colunas(gravadas.get(c.numero, 0)))
+            for c in self.contas
+        ]
+        return clientes, contas
 
 
 def menu():
@@ -178,13 +755,14 @@ def menu():
 [4]\tNova Conta
 [5]\tListar Contas
 [6]\tNovo Usuario
+[7]\tTransferir
 [0]\tSair
 => """
     return input(textwrap.dedent(menu))
 
 
-def filtrar_cliente(cpf, clientes):
-    return next((cliente for cliente in clientes if cliente.cpf == cpf), None)
+def filtrar_cliente(cpf, cadastro):
+    return cadastro.buscar_cliente(cpf)
 
 
 def recuperar_conta_cliente(cliente):
@@ -194,9 +772,9 @@ def recuperar_conta_cliente(cliente):
     return cliente.contas[0]
 
 
-def depositar(clientes):
+def depositar(cadastro):
     cpf = input("Informe o CPF do cliente: ")
-    cliente = filtrar_cliente(cpf, clientes)
+    cliente = filtrar_cliente(cpf, cadastro)
 
     if not cliente:
         print("Cliente nao encontrado")
@@ -208,9 +786,9 @@ def depositar(clientes):
         cliente.realizar_transacao(conta, Deposito(valor))
 
 
-def sacar(clientes):
+def sacar(cadastro):
     cpf = input("Informe o CPF do cliente: ")
-    cliente = filtrar_cliente(cpf, clientes)
+    cliente = filtrar_cliente(cpf, cadastro)
 
     if not cliente:
         print("Cliente nao encontrado")
@@ -222,9 +800,9 @@ def sacar(clientes):
         cliente.realizar_transacao(conta, Saque(valor))
 
 
-def exibir_extrato(clientes):
+def transferir(cadastro):
     cpf = input("Informe o CPF do cliente: ")
-    cliente = filtrar_cliente(cpf, clientes)
+    cliente = filtrar_cliente(cpf, cadastro)
 
     if not cliente:
         print("Cliente nao encontrado")
@@ -234,42 +812,124 @@ def exibir_extrato(clientes):
     if not conta:
         return
 
-    print("\n================ EXTRATO ================")
-    if not conta.historico.transacoes:
-        print("Nao foram realizadas movimentacoes.")
-    else:
-        for t in conta.historico.transacoes:
-            print(f"{t['data']} - {t['tipo']}: R$ {t['valor']:.2f}")
+    destino = cadastro.buscar_conta(int(input("Informe o numero da conta de destino: ")))
+    if not destino:
+        print("Conta de destino nao encontrada")
+        return
+
+    valor = float(input("Informe o valor da transferencia: "))
+    cliente.realizar_transacao(conta, Transferencia(valor, destino))
+
+
+_DATAS_FORMATADAS = {}
+
+
+def _formatar_data(instante):
+    # extratos grandes repetem o mesmo segundo muitas vezes
+    segundo = int(instante)
+    texto = _DATAS_FORMATADAS.get(segundo)
+    if texto is None:
+        if len(_DATAS_FORMATADAS) > 4096:
+            _DATAS_FORMATADAS.clear()
+        texto = _DATAS_FORMATADAS[segundo] = datetime.fromtimestamp(segundo).strftime(FORMATO_DATA)
+    return texto
+
+
+def escrever_extrato(conta, saida, formato="texto", inicio=None, fim=None, cursor=None,
+                     limite=None, tamanho_pagina=TAMANHO_PAGINA_EXTRATO):
+    """Escreve em `saida` o extrato da conta no periodo [inicio, fim), a
+    partir de `cursor`, com no maximo `limite` transacoes (todas se None).
+    Cada pagina de `tamanho_pagina` linhas vira um unico `write`.
+    `formato` e "texto" (o do menu) ou "csv" (com o saldo apos cada
+    transacao). Retorna o cursor da proxima pagina, ou None no fim."""
+    if formato not in FORMATOS_EXTRATO:
+        raise ValueError(f"Formato de extrato desconhecido: {formato}")
+    historico = conta.historico
+    texto = formato == "texto"
+    escritas = 0
+    saldo = None
+    primeira_pagina = True
+
+    while True:
+        tamanho = tamanho_pagina if limite is None else min(tamanho_pagina, limite - escritas)
+        linhas, saldo_anterior, proximo = historico.pagina_extrato(tamanho, cursor, inicio, fim)
+        partes = []
+        if primeira_pagina:
+            primeira_pagina = False
+            saldo = saldo_anterior
+            if texto:
+                partes.append("\n================ EXTRATO ================\n")
+                if saldo_anterior and (inicio is not None or cursor):
+                    partes.append(f"Saldo anterior: R$ {saldo_anterior / 100:.2f}\n")
+                if not linhas:
+                    partes.append("Nao foram realizadas movimentacoes.\n")
+            else:
+                partes.append("data,tipo,valor,saldo\n")
+
+        if texto:
+            partes.extend(
+                f"{_formatar_data(instante)} - {tipo}: R$ {centavos / 100:.2f}\n"
+                for instante, tipo, centavos, _ in linhas
+            )
+        else:
+            partes.extend(
+                f"{_formatar_data(instante)},{tipo},{centavos / 100:.2f},{depois / 100:.2f}\n"
+                for instante, tipo, centavos, depois in linhas
+            )
+        if linhas:
+            saldo = linhas[-1][3]
+        escritas += len(linhas)
+        cursor = proximo
+
+        terminou = proximo is None or (limite is not None and escritas >= limite)
+        if terminou and texto:
+            partes.append(f"\nSaldo: R$ {saldo / 100:.2f}\n")
+            partes.append("=========================================\n")
+        saida.write("".join(partes))
+        if terminou:
+            return proximo
+
+
+def exibir_extrato(cadastro):
+    cpf = input("Informe o CPF do cliente: ")
+    cliente = filtrar_cliente(cpf, cadastro)
+
+    if not cliente:
+        print("Cliente nao encontrado")
+        return
+
+    conta = recuperar_conta_cliente(cliente)
+    if not conta:
+        return
 
-    print(f"\nSaldo: R$ {conta.saldo:.2f}")
-    print("=========================================")
+    escrever_extrato(conta, sys.stdout)
 
 
-def criar_conta(numero_contas, clientes, contas):
+def criar_conta(numero_conta, cadastro):
     cpf = input("Informe o CPF do cliente: ")
-    cliente = filtrar_cliente(cpf, clientes)
+    cliente = filtrar_cliente(cpf, cadastro)
 
     if not cliente:
         print("Cliente nao encontrado")
         return
 
-    conta = ContaCorrente.nova_conta(cliente, numero_contas)
-    contas.append(conta)
+    conta = ContaCorrente.nova_conta(cliente, numero_conta)
+    cadastro.adicionar_conta(conta)
     cliente.adicionar_conta(conta)
 
     print("Conta criada com sucesso")
 
 
-def listar_contas(contas):
-    for conta in contas:
+def listar_contas(cadastro):
+    for conta in cadastro.contas:
         print("=" * 30)
         print(textwrap.dedent(str(conta)))
 
 
-def criar_cliente(clientes):
+def criar_cliente(cadastro):
     cpf = input("Informe o CPF (somente numeros): ")
 
-    if filtrar_cliente(cpf, clientes):
+    if filtrar_cliente(cpf, cadastro):
         print("Ja existe cliente com esse CPF")
         return
 
@@ -277,7 +937,7 @@ def criar_cliente(clientes):
     data_nascimento = input("Informe a data de nascimento (dd-mm-aaaa): ")
     endereco = input("Informe o endereco: ")
 
-    clientes.append(
+    cadastro.adicionar_cliente(
         PessoaFisica(nome, data_nascimento, cpf, endereco)
     )
 
@@ -285,28 +945,33 @@ def criar_cliente(clientes):
 
 
 def main():
-    clientes = []
-    contas = []
+    livro = LivroRazao(DIRETORIO_DADOS)
+    cadastro = livro.carregar(Cadastro())
 
     while True:
         opcao = menu()
 
         if opcao == "1":
-            depositar(clientes)
+            depositar(cadastro)
         elif opcao == "2":
-            sacar(clientes)
+            sacar(cadastro)
         elif opcao == "3":
-            exibir_extrato(clientes)
+            exibir_extrato(cadastro)
         elif opcao == "4":
-            criar_conta(len(contas) + 1, clientes, contas)
+            criar_conta(cadastro.proximo_numero(), cadastro)
         elif opcao == "5":
-            listar_contas(contas)
+            listar_contas(cadastro)
         elif opcao == "6":
-            criar_cliente(clientes)
+            criar_cliente(cadastro)
+        elif opcao == "7":
+            transferir(cadastro)
         elif opcao == "0":
+            livro.compactar()
+            livro.fechar()
             break
         else:
             print("Operacao invalida")
 
 
-main()
+if __name__ == "__main__":
+    main()
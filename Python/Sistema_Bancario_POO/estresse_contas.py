@@ -0,0 +1,103 @@
+"""Teste de estresse das travas por conta.
+
+Varias threads fazem depositos e saques ao mesmo tempo em contas
+compartilhadas (todas as threads na mesma conta) e em contas disjuntas (uma
+conta por thread). No fim confere, para cada conta, que o saldo nunca ficou
+negativo e que bate com a soma das transacoes do historico.
+
+    python estresse_contas.py --threads 8 --operacoes 20000
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import sys
+import threading
+import time
+
+from Sistrma_Bancario import Cadastro, ContaCorrente, Deposito, PessoaFisica, Saque
+
+
+def _criar_contas(cadastro, quantidade):
+    contas = []
+    for i in range(quantidade):
+        cliente = PessoaFisica(f"Cliente {i}", "01-01-2000", str(i), "Rua")
+        cadastro.adicionar_cliente(cliente)
+        # limites altos: o estresse e na trava, nao nas regras de saque
+        conta = ContaCorrente(cadastro.proximo_numero(), cliente, limite=10**9,
+                              limite_saques=10**9)
+        cadastro.adicionar_conta(conta)
+        cliente.adicionar_conta(conta)
+        contas.append(conta)
+    return contas
+
+
+def _trabalhar(contas, operacoes, semente, negativos):
+    aleatorio = random.Random(semente)
+    for _ in range(operacoes):
+        conta = aleatorio.choice(contas)
+        valor = aleatorio.randint(1, 100)
+        if aleatorio.random() < 0.5:
+            Deposito(valor).registrar(conta)
+        else:
+            Saque(valor).registrar(conta)
+        if conta.saldo < 0:
+            negativos.append(conta.numero)
+
+
+def conferir(conta):
+    totais = conta.historico.somar_por_tipo()
+    esperado = totais.get("Deposito", 0) - totais.get("Saque", 0)
+    return round(conta.saldo * 100) == esperado and conta.saldo >= 0
+
+
+def estressar(threads, operacoes, compartilhadas):
+    cadastro = Cadastro()
+    contas = _criar_contas(cadastro, compartilhadas + threads)
+    comuns, proprias = contas[:compartilhadas], contas[compartilhadas:]
+    negativos = []
+
+    trabalhadores = []
+    for i in range(threads):
+        # metade das threads disputa as contas comuns, metade usa a propria
+        alvo = comuns if i % 2 == 0 else [proprias[i]]
+        trabalhadores.append(threading.Thread(
+            target=_trabalhar, args=(alvo, operacoes, i, negativos)))
+
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for trabalhador in trabalhadores:
+            trabalhador.start()
+        for trabalhador in trabalhadores:
+            trabalhador.join()
+    segundos = time.perf_counter() - inicio
+
+    erradas = [conta.numero for conta in contas if not conferir(conta)]
+    return {
+        "operacoes": threads * operacoes,
+        "segundos": round(segundos, 3),
+        "por_segundo": round(threads * operacoes / segundos),
+        "contas_inconsistentes": erradas,
+        "saldos_negativos": sorted(set(negativos)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estresse de saques e depositos concorrentes")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--operacoes", type=int, default=20_000)
+    parser.add_argument("--compartilhadas", type=int, default=2)
+    args = parser.parse_args()
+
+    # trocas de thread frequentes deixam as corridas aparecerem
+    sys.setswitchinterval(1e-6)
+    resultado = estressar(args.threads, args.operacoes, args.compartilhadas)
+    for chave, valor in resultado.items():
+        print(f"{chave}: {valor}")
+    if resultado["contas_inconsistentes"] or resultado["saldos_negativos"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
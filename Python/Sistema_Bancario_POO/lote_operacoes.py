@@ -0,0 +1,235 @@
+"""Processamento de depositos e saques em lote.
+
+Formatos de entrada (escolhidos pela extensao, ou por `formato=`):
+
+    csv     colunas `cpf,conta,tipo,valor`, cabecalho obrigatorio; basta
+            preencher `cpf` ou `conta`
+    jsonl   um objeto por linha com as mesmas chaves
+
+`tipo` e `deposito` ou `saque`. Com o CPF a operacao vai para a primeira
+conta do cliente, como no menu. As regras sao as mesmas da
+`ContaCorrente` (limite por saque, saques por dia, ...).
+
+O arquivo e lido em blocos de `TAMANHO_BLOCO` linhas, entao a memoria nao
+cresce com o tamanho da entrada. Dentro de um bloco as operacoes sao
+agrupadas por conta e cada conta e travada uma vez so, aplicando as suas
+operacoes na ordem do arquivo. Com `particoes > 1` os grupos sao divididos
+por numero de conta entre threads.
+
+O relatorio tem uma linha por operacao, na ordem da entrada:
+`linha,situacao,motivo,conta,saldo` (csv) ou objetos com essas chaves
+(jsonl). `linha` e a linha do arquivo de entrada, contando as em branco e
+sem contar o cabecalho do csv.
+
+    python lote_operacoes.py operacoes.csv --relatorio resultado.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+
+from persistencia import LivroRazao
+from Sistrma_Bancario import DIRETORIO_DADOS, Cadastro, Deposito, Saque
+
+TAMANHO_BLOCO = 10_000
+CAMPOS_RELATORIO = ["linha", "situacao", "motivo", "conta", "saldo"]
+
+TIPOS = {
+    "deposito": Deposito,
+    "depósito": Deposito,
+    "saque": Saque,
+}
+
+EXTENSOES = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".json": "jsonl",
+}
+
+
+def detectar_formato(caminho):
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao not in EXTENSOES:
+        raise ValueError(f"Formato desconhecido para {caminho}; use formato=")
+    return EXTENSOES[extensao]
+
+
+# ---------------------------------------------------------------- leitura
+
+def _registros_csv(arquivo):
+    """(linha, registro); o DictReader pula linhas em branco, entao a
+    linha vem do contador do leitor."""
+    leitor = csv.DictReader(arquivo)
+    for registro in leitor:
+        yield leitor.line_num - 1, registro
+
+
+def _registros_jsonl(arquivo):
+    for numero, linha in enumerate(arquivo, 1):
+        if not linha.strip():
+            continue
+        try:
+            yield numero, json.loads(linha)
+        except ValueError:
+            yield numero, None
+
+
+def _resolver(cadastro, registro):
+    """Retorna (conta, transacao, None) ou (None, None, motivo)."""
+    if not isinstance(registro, dict):
+        return None, None, "linha invalida"
+
+    classe = TIPOS.get(str(registro.get("tipo") or "").strip().lower())
+    if classe is None:
+        return None, None, "tipo invalido"
+    try:
+        valor = float(registro.get("valor"))
+    except (TypeError, ValueError):
+        return None, None, "valor invalido"
+
+    # conta 0 e um numero (que nao existe), nao a falta dele
+    numero = registro.get("conta")
+    numero = "" if numero is None else str(numero).strip()
+    cpf = registro.get("cpf")
+    cpf = "" if cpf is None else str(cpf).strip()
+    if numero:
+        conta = cadastro.buscar_conta(int(numero)) if numero.isdigit() else None
+        if conta is None:
+            return None, None, "conta nao encontrada"
+    elif cpf:
+        cliente = cadastro.buscar_cliente(cpf)
+        if cliente is None:
+            return None, None, "cliente nao encontrado"
+        if not cliente.contas:
+            return None, None, "cliente nao possui conta"
+        conta = cliente.contas[0]
+    else:
+        return None, None, "conta nao informada"
+    return conta, classe(valor), None
+
+
+# ------------------------------------------------------------ aplicacao
+
+def _aplicar_grupo(conta, operacoes, resultados):
+    """Aplica, com a conta travada uma vez so, as operacoes dela na ordem
+    do arquivo."""
+    with conta.trava:
+        for posicao, transacao in operacoes:
+            if isinstance(transacao, Saque):
+                motivo = conta.recusa_saque(transacao.valor)
+            else:
+                motivo = conta.recusa_deposito(transacao.valor)
+            if motivo is None:
+                conta.efetivar(transacao)
+            resultados[posicao] = (motivo, conta.numero, conta.saldo)
+
+
+def _aplicar_particao(grupos, resultados, livro):
+    # cada thread espera o fsync so no fim da sua parte
+    with livro.adiar() if livro is not None else nullcontext():
+        for conta, operacoes in grupos:
+            _aplicar_grupo(conta, operacoes, resultados)
+
+
+def _processar_bloco(cadastro, registros, executor, particoes, livro):
+    resultados = [None] * len(registros)
+    grupos = {}
+    for posicao, registro in enumerate(registros):
+        conta, transacao, motivo = _resolver(cadastro, registro)
+        if motivo is not None:
+            resultados[posicao] = (motivo, None, None)
+        else:
+            grupos.setdefault(conta.numero, (conta, []))[1].append((posicao, transacao))
+
+    if executor is None:
+        _aplicar_particao(grupos.values(), resultados, livro)
+    else:
+        partes = [[] for _ in range(particoes)]
+        for numero, grupo in grupos.items():
+            partes[numero % particoes].append(grupo)
+        for futuro in [executor.submit(_aplicar_particao, parte, resultados, livro)
+                       for parte in partes if parte]:
+            futuro.result()
+    return resultados
+
+
+# ------------------------------------------------------------ relatorio
+
+def _linhas_relatorio(linhas, resultados):
+    for linha, (motivo, numero, saldo) in zip(linhas, resultados):
+        yield {
+            "linha": linha,
+            "situacao": "ok" if motivo is None else "recusada",
+            "motivo": motivo or "",
+            "conta": "" if numero is None else numero,
+            "saldo": "" if saldo is None else f"{saldo:.2f}",
+        }
+
+
+def processar(cadastro, caminho, caminho_relatorio, formato=None, formato_relatorio=None,
+              particoes=1, livro=None, tamanho_bloco=TAMANHO_BLOCO):
+    """Processa o arquivo de operacoes e grava o relatorio; retorna
+    `(aceitas, recusadas)`."""
+    formato = formato or detectar_formato(caminho)
+    formato_relatorio = formato_relatorio or detectar_formato(caminho_relatorio)
+    ler = _registros_csv if formato == "csv" else _registros_jsonl
+
+    aceitas = recusadas = 0
+    executor = ThreadPoolExecutor(particoes) if particoes > 1 else None
+    try:
+        with open(caminho, newline="", encoding="utf-8") as entrada, \
+                open(caminho_relatorio, "w", newline="", encoding="utf-8") as saida:
+            escritor = None
+            if formato_relatorio == "csv":
+                escritor = csv.DictWriter(saida, fieldnames=CAMPOS_RELATORIO)
+                escritor.writeheader()
+            registros = ler(entrada)
+            while True:
+                bloco = list(islice(registros, tamanho_bloco))
+                if not bloco:
+                    break
+                linhas, registros_bloco = zip(*bloco)
+                resultados = _processar_bloco(cadastro, registros_bloco, executor, particoes,
+                                              livro)
+                for item in _linhas_relatorio(linhas, resultados):
+                    if escritor is not None:
+                        escritor.writerow(item)
+                    else:
+                        saida.write(json.dumps(item, ensure_ascii=False))
+                        saida.write("\n")
+                    if item["situacao"] == "ok":
+                        aceitas += 1
+                    else:
+                        recusadas += 1
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return aceitas, recusadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Processa depositos e saques em lote")
+    parser.add_argument("arquivo")
+    parser.add_argument("--relatorio", required=True)
+    parser.add_argument("--formato", choices=sorted(set(EXTENSOES.values())))
+    parser.add_argument("--particoes", type=int, default=1)
+    parser.add_argument("--dados", default=DIRETORIO_DADOS)
+    args = parser.parse_args()
+
+    livro = LivroRazao(args.dados)
+    cadastro = livro.carregar(Cadastro())
+    try:
+        aceitas, recusadas = processar(cadastro, args.arquivo, args.relatorio,
+                                       formato=args.formato, particoes=args.particoes,
+                                       livro=livro)
+    finally:
+        livro.fechar()
+    print(f"{aceitas} operacoes aceitas, {recusadas} recusadas")
+
+
+if __name__ == "__main__":
+    main()
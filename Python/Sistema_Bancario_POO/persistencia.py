@@ -0,0 +1,395 @@
+"""Livro razao do banco: log de escrita antecipada + snapshot.
+
+Cada cliente, conta e transacao confirmada vira uma linha JSON no log da
+geracao atual (`livro.<geracao>.log`). As linhas vao para o buffer do
+arquivo na hora; uma thread de sincronizacao faz `fsync` de tudo que
+acumulou a cada `intervalo` segundos (group commit), e quem registrou
+espera so ate a sua linha estar no disco - um fsync atende todas as
+operacoes que chegaram no mesmo intervalo. Dentro de `with livro.adiar():`
+a espera fica para o fim do bloco, o que serve para cargas em lote.
+
+De tempos em tempos o livro abre o log da proxima geracao e grava um
+snapshot dela. O historico de cada conta so cresce, entao o snapshot
+(`livro.snap`) guarda saldos, contadores e quanto vale de `livro.hist`, e
+as transacoes novas desde o snapshot anterior vao para o fim de
+`livro.hist`, uma linha por compactacao. Todas as travas ficam presas so
+enquanto o estado e copiado e o log e trocado; a gravacao roda depois,
+sem elas. Na recuperacao basta ler o snapshot, as linhas validas de
+`livro.hist` e reaplicar os logs a partir da geracao do snapshot.
+
+O livro e um observador do `Cadastro` (e das contas dele), que chama
+`cliente_adicionado`, `conta_adicionada`, `transacao_registrada` e
+`transferencias_registradas`.
+"""
+
+import base64
+import json
+import os
+import threading
+from array import array
+from contextlib import contextmanager
+
+VERSAO = 2
+COMPACTAR_A_CADA = 100_000
+INTERVALO_FSYNC = 0.002
+
+
+def _codificar(colunas):
+    return base64.b64encode(colunas.tobytes()).decode("ascii")
+
+
+def _decodificar(tipo, texto):
+    colunas = array(tipo)
+    colunas.frombytes(base64.b64decode(texto))
+    return colunas
+
+
+class LivroRazao:
+    def __init__(self, diretorio, compactar_a_cada=COMPACTAR_A_CADA,
+                 intervalo=INTERVALO_FSYNC):
+        self.diretorio = diretorio
+        self.compactar_a_cada = compactar_a_cada
+        self.intervalo = intervalo
+        self.cadastro = None
+        self.geracao = 0
+        self.eventos_no_log = 0
+        self.fsyncs = 0
+        self._geracao_snapshot = 0
+        # transacoes de cada conta e bytes validos em livro.hist
+        self._gravadas = {}
+        self._historico_valido = 0
+        self._log = None
+        self._escritos = 0
+        self._duraveis = 0
+        self._condicao = threading.Condition()
+        self._arquivo = threading.Lock()
+        self._compactando = threading.Lock()
+        self._compactador = None
+        self._local = threading.local()
+        self._sincronizador = None
+        self._fechando = False
+        os.makedirs(diretorio, exist_ok=True)
+
+    @property
+    def caminho_snapshot(self):
+        return os.path.join(self.diretorio, "livro.snap")
+
+    @property
+    def caminho_historico(self):
+        return os.path.join(self.diretorio, "livro.hist")
+
+    def caminho_log(self, geracao):
+        return os.path.join(self.diretorio, f"livro.{geracao}.log")
+
+    # ------------------------------------------------------------ leitura
+
+    def carregar(self, cadastro):
+        """Preenche `cadastro` (vazio) com o snapshot mais os logs a partir
+        da geracao dele e passa a registrar as mudancas seguintes."""
+        self.cadastro = cadastro
+        if os.path.exists(self.caminho_snapshot):
+            self._ler_snapshot(cadastro)
+        self._apagar_logs_antigos()
+        # uma queda antes de gravar o snapshot deixa o log da geracao
+        # seguinte ja aberto: os dois sao reaplicados, em ordem
+        self.eventos_no_log = self._reaplicar(self.caminho_log(self.geracao))
+        while os.path.exists(self.caminho_log(self.geracao + 1)):
+            self.geracao += 1
+            self.eventos_no_log += self._reaplicar(self.caminho_log(self.geracao))
+        self._abrir_log()
+        self._sincronizador = threading.Thread(target=self._sincronizar, daemon=True)
+        self._sincronizador.start()
+        cadastro.observadores.append(self)
+        return cadastro
+
+    def _ler_snapshot(self, cadastro):
+        with open(self.caminho_snapshot, encoding="utf-8") as arquivo:
+            snapshot = json.load(arquivo)
+        versao = snapshot.get("versao")
+        if versao not in (1, VERSAO):
+            raise ValueError(f"Snapshot invalido: {self.caminho_snapshot}")
+        self.geracao = self._geracao_snapshot = snapshot["geracao"]
+        for cliente in snapshot["clientes"]:
+            cadastro.restaurar_cliente(*cliente)
+        if versao == VERSAO:
+            historico = self._ler_historico(snapshot["historico"])
+            self._historico_valido = snapshot["historico"]
+        for conta in snapshot["contas"]:
+            if versao == 1:
+                # historico inteiro no snapshot; a proxima compactacao o
+                # passa para livro.hist
+                nomes, tipos, valores, datas = conta["historico"]
+                colunas = (nomes, _decodificar("B", tipos), _decodificar("q", valores),
+                           _decodificar("d", datas))
+            else:
+                tipos, valores, datas = historico.get(
+                    conta["numero"], (array("B"), array("q"), array("d")))
+                if len(tipos) != conta["transacoes"]:
+                    raise ValueError(f"Historico incompleto: {self.caminho_historico}")
+                self._gravadas[conta["numero"]] = len(tipos)
+                colunas = (conta["tipos"], tipos, valores, datas)
+            cadastro.restaurar_conta(conta["numero"], conta["cpf"], conta["limite"],
+                                     conta["limite_saques"], conta["saldo"], colunas)
+
+    def _ler_historico(self, valido):
+        """Colunas {numero: (tipos, valores, datas)} dos primeiros `valido`
+        bytes de livro.hist; o resto, de uma compactacao que caiu antes de
+        gravar o snapshot, e cortado."""
+        colunas = {}
+        if not os.path.exists(self.caminho_historico):
+            if valido:
+                raise ValueError(f"Historico ausente: {self.caminho_historico}")
+            return colunas
+        with open(self.caminho_historico, "r+b") as arquivo:
+            dados = arquivo.read(valido)
+            if len(dados) != valido:
+                raise ValueError(f"Historico incompleto: {self.caminho_historico}")
+            arquivo.truncate(valido)
+        for linha in dados.splitlines():
+            for numero, tipos, valores, datas in json.loads(linha):
+                partes = colunas.setdefault(numero, (array("B"), array("q"), array("d")))
+                partes[0].extend(_decodificar("B", tipos))
+                partes[1].extend(_decodificar("q", valores))
+                partes[2].extend(_decodificar("d", datas))
+        return colunas
+
+    def _apagar_logs_antigos(self):
+        """Apaga os logs de geracoes que o snapshot ja cobre."""
+        for nome in os.listdir(self.diretorio):
+            partes = nome.split(".")
+            if (len(partes) == 3 and partes[0] == "livro" and partes[2] == "log"
+                    and partes[1].isdigit() and int(partes[1]) < self._geracao_snapshot):
+                os.remove(os.path.join(self.diretorio, nome))
+
+    def _reaplicar(self, caminho):
+        if not os.path.exists(caminho):
+            return 0
+        total = 0
+        valido = 0
+        with open(caminho, "r+b") as arquivo:
+            for linha in arquivo:
+                try:
+                    if not linha.endswith(b"\n"):
+                        raise ValueError
+                    evento, *argumentos = json.loads(linha)
+                except ValueError:
+                    # ultima linha cortada por uma queda no meio da escrita:
+                    # corta o arquivo para o proximo registro nao colar nela
+                    arquivo.truncate(valido)
+                    break
+                self._aplicar(evento, argumentos)
+                valido += len(linha)
+                total += 1
+        return total
+
+    def _aplicar(self, evento, argumentos):
+        cadastro = self.cadastro
+        if evento == "cliente+":
+            cadastro.restaurar_cliente(*argumentos)
+        elif evento == "conta+":
+            cadastro.restaurar_conta(*argumentos)
+        elif evento == "transacao":
+            numero, tipo, centavos, efeito, instante = argumentos
+            cadastro.buscar_conta(numero).aplicar(tipo, centavos, efeito, instante)
+        elif evento == "transferencia":
+            origem, destino, centavos, instante = argumentos
+            cadastro.buscar_conta(origem).aplicar("TransferenciaEnviada", centavos, -1, instante)
+            cadastro.buscar_conta(destino).aplicar("TransferenciaRecebida", centavos, 1, instante)
+
+    # ------------------------------------------------------------ escrita
+
+    def _abrir_log(self):
+        if self._log is not None:
+            self._log.close()
+        self._log = open(self.caminho_log(self.geracao), "a", encoding="utf-8")
+
+    def _sincronizar(self):
+        while True:
+            with self._condicao:
+                while self._duraveis == self._escritos and not self._fechando:
+                    self._condicao.wait()
+                if self._duraveis == self._escritos:
+                    return
+            # deixa mais registros chegarem antes do fsync
+            if self.intervalo:
+                threading.Event().wait(self.intervalo)
+            self._descarregar()
+
+    def _descarregar(self):
+        # o fsync roda fora de `_condicao` para nao travar quem registra;
+        # `_arquivo` so impede a compactacao de trocar o log no meio
+        with self._arquivo:
+            with self._condicao:
+                alvo = self._escritos
+                if self._duraveis >= alvo:
+                    return
+                self._log.flush()
+                descritor = self._log.fileno()
+            os.fsync(descritor)
+            with self._condicao:
+                self.fsyncs += 1
+                self._duraveis = max(self._duraveis, alvo)
+                self._condicao.notify_all()
+
+    def _esperar(self, sequencia):
+        with self._condicao:
+            while self._duraveis < sequencia:
+                self._condicao.wait()
+
+    @contextmanager
+    def adiar(self):
+        """Dentro do bloco `_registrar` nao espera o fsync; a espera pela
+        ultima linha escrita acontece uma vez so, na saida."""
+        anterior = getattr(self._local, "adiado", False)
+        self._local.adiado = True
+        try:
+            yield self
+        finally:
+            self._local.adiado = anterior
+            if not anterior:
+                self._esperar(self._escritos)
+
+    def _registrar(self, *evento):
+        self._registrar_varios([evento])
+
+    def _registrar_varios(self, eventos):
+        texto = "".join(json.dumps(evento, ensure_ascii=False) + "\n" for evento in eventos)
+        with self._condicao:
+            self._log.write(texto)
+            self._escritos += 1
+            sequencia = self._escritos
+            self.eventos_no_log += len(eventos)
+            self._condicao.notify_all()
+            compactar = self.eventos_no_log >= self.compactar_a_cada
+        # quem registra segura travas de conta: a compactacao, que trava
+        # todas as contas, roda numa thread propria
+        if compactar and self._compactando.acquire(blocking=False):
+            self._compactador = threading.Thread(target=self._compactar_travado, daemon=True)
+            self._compactador.start()
+        if not getattr(self._local, "adiado", False):
+            self._esperar(sequencia)
+
+    def compactar(self):
+        """Grava saldos e historicos como snapshot da proxima geracao,
+        troca para um log vazio e apaga o log antigo. Nao pode ser chamado
+        por quem segura a trava de alguma conta.
+
+        Ordem das travas: cadastro, contas (por numero), arquivo, condicao -
+        a mesma de quem registra, entao nenhuma operacao fica no snapshot e
+        no log novo ao mesmo tempo."""
+        self._compactando.acquire()
+        self._compactar_travado()
+
+    def _compactar_travado(self):
+        """Compacta e solta `_compactando`, que o chamador ja adquiriu."""
+        try:
+            with self.cadastro.travar_tudo():
+                geracao, clientes, contas = self._capturar()
+            self._gravar_snapshot(geracao, clientes, contas)
+        finally:
+            self._compactando.release()
+
+    def _capturar(self):
+        """Copia o estado (so as transacoes ainda fora de livro.hist) e
+        troca para o log da proxima geracao. O que estava no log antigo
+        esta na copia; o que vier depois vai para o log novo."""
+        with self._arquivo, self._condicao:
+            clientes, contas = self.cadastro.estado(self._gravadas)
+            # o log antigo so e apagado depois do snapshot; ate la a
+            # recuperacao depende dele inteiro no disco
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            self.geracao += 1
+            self.eventos_no_log = 0
+            self._abrir_log()
+            self._duraveis = self._escritos
+            self._condicao.notify_all()
+            return self.geracao, clientes, contas
+
+    def _gravar_snapshot(self, geracao, clientes, contas):
+        """Grava, sem as travas, a copia de `_capturar`: as transacoes novas
+        no fim de livro.hist e depois o snapshot que as torna validas."""
+        gravadas = dict(self._gravadas)
+        novas = []
+        for numero, _, _, _, _, (_, tipos, valores, datas) in contas:
+            if tipos:
+                novas.append([numero, _codificar(tipos), _codificar(valores),
+                              _codificar(datas)])
+            gravadas[numero] = gravadas.get(numero, 0) + len(tipos)
+        valido = self._historico_valido
+        if novas:
+            with open(self.caminho_historico, "ab") as arquivo:
+                # sobra de uma compactacao que falhou antes do snapshot
+                arquivo.truncate(valido)
+                arquivo.write(json.dumps(novas).encode("ascii") + b"\n")
+                arquivo.flush()
+                os.fsync(arquivo.fileno())
+                valido = arquivo.tell()
+
+        snapshot = {
+            "versao": VERSAO,
+            "geracao": geracao,
+            "clientes": clientes,
+            "historico": valido,
+            "contas": [
+                {
+                    "numero": numero,
+                    "cpf": cpf,
+                    "limite": limite,
+                    "limite_saques": limite_saques,
+                    "saldo": saldo,
+                    "tipos": nomes,
+                    "transacoes": gravadas[numero],
+                }
+                for numero, cpf, limite, limite_saques, saldo, (nomes, *_) in contas
+            ],
+        }
+        temporario = self.caminho_snapshot + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(snapshot, arquivo, ensure_ascii=False)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, self.caminho_snapshot)
+        self._gravadas = gravadas
+        self._historico_valido = valido
+        self._geracao_snapshot = geracao
+        self._apagar_logs_antigos()
+
+    def fechar(self):
+        compactador = self._compactador
+        if compactador is not None and compactador is not threading.current_thread():
+            compactador.join()
+        with self._condicao:
+            self._fechando = True
+            self._condicao.notify_all()
+        if self._sincronizador is not None:
+            self._sincronizador.join()
+            self._sincronizador = None
+        if self._log is not None:
+            self._descarregar()
+            self._log.close()
+            self._log = None
+        if self.cadastro is not None and self in self.cadastro.observadores:
+            self.cadastro.observadores.remove(self)
+
+    # ------------------------------------------------------- observador
+
+    def cliente_adicionado(self, cliente):
+        self._registrar("cliente+", cliente.cpf, cliente.nome, cliente.data_nascimento,
+                        cliente.endereco)
+
+    def conta_adicionada(self, conta):
+        self._registrar("conta+", conta.numero, conta.cliente.cpf, conta.limite,
+                        conta.limite_saques)
+
+    def transferencias_registradas(self, transferencias):
+        # uma linha por transferencia: as duas pernas entram ou somem juntas
+        self._registrar_varios([
+            ("transferencia", origem.numero, transferencia.destino.numero,
+             transferencia.centavos, instante)
+            for origem, transferencia, instante in transferencias
+        ])
+
+    def transacao_registrada(self, conta, transacao, instante):
+        self._registrar("transacao", conta.numero, transacao.__class__.__name__,
+                        transacao.centavos, transacao.efeito, instante)